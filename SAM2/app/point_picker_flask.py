@@ -16,15 +16,44 @@ Design goals:
 
 from __future__ import annotations
 
+import functools
+import gzip
+import hashlib
 import json
-import glob
+import mimetypes
 import os
-import subprocess
+import shutil
+import struct
+import threading
+import time
+import types
 from pathlib import Path
-from typing import Dict, List, Tuple, Any
 
+try:
+    import orjson  # ~5x faster than stdlib json; optional
+except ImportError:
+    orjson = None
 
-from flask import Flask, request, redirect, render_template_string, send_from_directory, jsonify
+try:
+    import brotli  # optional; better HTML compression than gzip
+except ImportError:
+    brotli = None
+
+try:
+    import msgspec  # optional; fused SIMD JSON parse + schema validation
+except ImportError:
+    msgspec = None
+
+try:
+    import minify_html  # optional; strips template whitespace/comments
+except ImportError:
+    minify_html = None
+
+
+import jinja2
+from flask import Flask, Response, request, redirect, jsonify
+from werkzeug.utils import safe_join
+from werkzeug.wsgi import wrap_file
 
 
 # =============================================================================
@@ -50,11 +79,43 @@ USE_EXISTING = INDEXED_DIR / "__use_existing.flag"
 PREVIEW_DIR = INDEXED_DIR / "preview"
 PREVIEW_DIR.mkdir(parents=True, exist_ok=True)
 
+# Optional: when a reverse proxy fronts the picker, set NGINX_INTERNAL_PREFIX
+# (e.g. "/internal_data") and let nginx sendfile() the image bytes itself via
+# X-Accel-Redirect instead of streaming them through the WSGI stack.
+# nginx needs a matching internal location, e.g.:
+#   location /internal_data/ { internal; alias /; sendfile on; }
+NGINX_INTERNAL_PREFIX = os.environ.get("NGINX_INTERNAL_PREFIX", "").rstrip("/")
+USE_XACCEL = bool(NGINX_INTERNAL_PREFIX)
+
+# Read buffer for serving image bytes from Flask itself (see _send_frame_file).
+_SEND_BUFFER_SIZE = 256 * 1024
+
+# Max preview width in pixels; 0 keeps previews at full frame resolution.
+PREVIEW_MAX_W = int(os.environ.get("PREVIEW_MAX_W", "0"))
+
+# Derived configuration frozen at import: request handlers read attributes
+# off this namespace instead of re-deriving strings or touching os.environ.
+CFG = types.SimpleNamespace(
+    ds_name=DS_NAME,
+    input=INPUT,
+    out_root=OUT_ROOT,
+    indexed_dir=str(INDEXED_DIR),
+    prompts_json=str(PROMPTS_JSON),
+    done_flag=str(DONE_FLAG),
+    use_existing=str(USE_EXISTING),
+    preview_dir=str(PREVIEW_DIR),
+)
+
+# Environment for the preview child process, built once at import.
+_PREVIEW_ENV = {**os.environ, "QUIET": "0"}
+
 
 # =============================================================================
 # HTML Templates (Apple-like UI)
 #  - Kept inline for single-file convenience.
-#  - If you prefer, split to separate files later and load them with Flask templates.
+#  - PICK_HTML's static CSS/JS live in static/picker.css / static/picker.js
+#    so the browser can cache them across reloads; only the small HTML
+#    shell goes through Jinja.
 # =============================================================================
 
 HOME_HTML = """
@@ -180,139 +241,8 @@ PICK_HTML = """
 <!doctype html><meta charset="utf-8">
 <title>Picker</title>
 <meta name="viewport" content="width=device-width,initial-scale=1,viewport-fit=cover">
-<style>
-  :root{
-    --bg: #0b0b0d; --ink: #f5f5f7; --muted: #a3a3aa;
-    --card: rgba(22,22,24,0.66); --border: rgba(255,255,255,0.08);
-    --accent: #0a84ff; --pos: #34c759; --neg: #ff3b30;
-    --shadow: 0 30px 80px rgba(0,0,0,0.45); --glass: saturate(180%) blur(22px);
-  }
-  @keyframes bounceDot {
-    0%, 80%, 100% { transform: translateY(0); opacity: 0.4; }
-    40%          { transform: translateY(-4px); opacity: 1; }
-  }
-
-  .dot-bounce{
-    animation: bounceDot 0.7s ease-in-out infinite;
-  }
-
-  @media (prefers-color-scheme: light){
-    :root{ --bg:#f5f5f7; --ink:#0b0b0d; --muted:#6e6e73; --card:rgba(255,255,255,0.72); --border:rgba(0,0,0,0.08); --shadow:0 30px 70px rgba(0,0,0,0.12); }
-  }
-  *{ box-sizing:border-box }
-  html,body{ height:100%; }
-  body{
-    margin:0; color:var(--ink);
-    background: radial-gradient(1200px 800px at 10% -10%, rgba(10,132,255,0.14), transparent 60%),
-               radial-gradient(1000px 700px at 120% 110%, rgba(94,92,230,0.14), transparent 60%),
-               var(--bg);
-    font: 15px/1.55 -apple-system,BlinkMacSystemFont,"SF Pro Text","Segoe UI",Roboto,Helvetica,Arial;
-    display:flex; flex-direction:column; gap:12px; padding:12px;
-  }
-
-  .shell{ max-width: 1600px; margin:0 auto; width:100%;
-          display:grid; grid-template-columns: 1.35fr 0.65fr; gap:12px; }
-  .shell.expanded{ grid-template-columns: 1fr; max-width: 96vw; }
-  .shell.expanded .drawer{ display:none; }
-  .shell.expanded .main{ min-height: 90vh; }
-
-  .hero{
-    grid-column: 1 / -1;
-    border:1px solid var(--border);
-    border-radius:18px; background:var(--card); backdrop-filter:var(--glass); box-shadow:var(--shadow);
-    padding:12px 14px; display:flex; align-items:center; gap:14px; overflow:hidden; position:relative;
-  }
-
-  .badge{ display:inline-flex; align-items:center; gap:8px; padding:6px 10px; border:1px solid var(--border);
-    border-radius:999px; background:rgba(255,255,255,0.06); color:var(--muted); font-weight:600; }
-  .dot{ width:8px; height:8px; border-radius:50%; background:var(--accent); box-shadow:0 0 0 5px rgba(10,132,255,0.18); }
-  .hero-title{ font-weight:700; letter-spacing:.2px; }
-  .hero-sub{ color:var(--muted) }
-
-  .main{
-    grid-column:1 / 2;
-    border:1px solid var(--border); border-radius:18px; background:var(--card); backdrop-filter:var(--glass); box-shadow:var(--shadow);
-    display:flex; flex-direction:column; overflow:hidden; min-height: 86vh;
-  }
-  .head{ display:flex; align-items:center; gap:12px; padding:10px 12px; border-bottom:1px solid var(--border); }
-  .spacer{ flex:1 1 auto; }
-  .pill{ padding:6px 10px; border:1px solid var(--border); border-radius:999px; color:var(--muted); background:rgba(255,255,255,0.06); }
-
-  .stage{ position:relative; flex:1 1 auto; min-height:0; overflow:hidden; padding:0;
-          background: linear-gradient(180deg, rgba(0,0,0,0.06), transparent 50%), transparent; }
-
-  canvas#c{
-    position:absolute; inset:0; margin:0;
-    box-shadow: 0 12px 40px rgba(0,0,0,0.25);
-    border-radius:14px; background:#000; border:1px solid var(--border);
-    outline: 1px solid rgba(255,255,255,0.04);
-    touch-action:none; cursor: crosshair;
-  }
-
-  .overlay-ui{
-    position:absolute; left:16px; bottom:16px; display:flex; gap:10px; align-items:center; flex-wrap:wrap;
-    pointer-events: none;
-  }
-  .overlay-ui > *{ pointer-events:auto; }
-
-  .btn{
-    appearance:none; padding:10px 14px; border-radius:12px;
-    border:1px solid rgba(0,0,0,0.08);
-    background: linear-gradient(180deg, rgba(255,255,255,0.96), rgba(255,255,255,0.82));
-    color:#111; font-weight:700; letter-spacing:.2px;
-    box-shadow:0 10px 22px rgba(0,0,0,0.10);
-    transition: transform .06s ease, box-shadow .2s ease, background .2s ease;
-    user-select:none;
-  }
-  .btn:hover{ transform: translateY(-1px); box-shadow:0 12px 26px rgba(0,0,0,0.14); }
-  .btn:active{ transform: translateY(0); box-shadow:0 8px 18px rgba(0,0,0,0.10); }
-  .btn-ghost{ background: rgba(255,255,255,0.85); color:#111; border:1px solid rgba(0,0,0,0.08); }
-  .btn-primary{ background: linear-gradient(180deg, var(--accent), #0568db); color:#fff; border:none; box-shadow: 0 14px 28px rgba(10,132,255,0.35); }
-
-  .seg-switch{ display:inline-flex; gap:6px; align-items:center; padding:6px; border-radius:999px; background:rgba(255,255,255,0.06); border:1px solid var(--border); }
-  .seg-switch button{ padding:8px 12px; border-radius:999px; border:1px solid transparent; background:transparent; color:var(--muted); font-weight:700; }
-  .seg-switch button.active.pos{ background: var(--pos); color:#fff; }
-  .seg-switch button.active.neg{ background: var(--neg); color:#fff; }
-
-  .coords{
-    position:absolute; right:16px; bottom:16px; padding:8px 12px; border-radius:10px;
-    background: rgba(255,255,255,0.06); border:1px solid var(--border); backdrop-filter:var(--glass); color:var(--muted); font-weight:600;
-  }
-
-  .drawer{ grid-column: 2 / 3; width: 300px; display:flex; flex-direction:column; gap:10px; }
-  .panel{ border:1px solid var(--border); border-radius:18px; background:var(--card); backdrop-filter:var(--glass); box-shadow:var(--shadow); overflow:hidden; }
-  .panel .hd{ padding:12px 14px; border-bottom:1px solid var(--border); display:flex; align-items:center; gap:8px; }
-  .panel .bd{ padding:10px 12px; max-height: 40vh; overflow:auto; }
-  .row{ display:flex; align-items:center; justify-content:space-between; gap:10px; padding:6px 2px; border-bottom:1px dashed rgba(255,255,255,0.06) }
-  .row:last-child{ border-bottom:0 }
-
-  .toast{
-    position: fixed; left:50%; bottom:22px; transform: translateX(-50%);
-    padding:10px 14px; border-radius:12px; border:1px solid var(--border);
-    background: var(--card); color:var(--ink); backdrop-filter:var(--glass); box-shadow: var(--shadow);
-    opacity:0; pointer-events:none; transition: opacity .25s ease;
-  }
-  .toast.show{ opacity: 1; }
+<link rel="stylesheet" href="/static/picker.css">
 
-  .key{ display:inline-flex; align-items:center; justify-content:center; min-width:22px; height:22px; padding:0 6px;
-        border:1px solid var(--border); border-radius:8px; background:rgba(255,255,255,0.08); color:var(--muted); font-weight:700; font-size:12px; }
-
-  .crosshair{ position:absolute; inset:0; pointer-events:none }
-  .crosshair .h, .crosshair .v{ position:absolute; background:rgba(255,255,255,0.28); }
-  .crosshair .h{ height:1px; width:100%; top:0; transform: translateY(var(--y,0)); }
-  .crosshair .v{ width:1px; height:100%; left:0; transform: translateX(var(--x,0)); }
-
-  .grid{ position:absolute; inset:0; pointer-events:none;
-    background-image: linear-gradient(rgba(255,255,255,0.06) 1px, transparent 1px),
-                      linear-gradient(90deg, rgba(255,255,255,0.06) 1px, transparent 1px);
-    background-size: 40px 40px, 40px 40px; opacity:0; transition: opacity .2s ease; }
-  .grid.show{ opacity:1; }
-
-  @media (max-width: 1100px){
-    .shell{ grid-template-columns: 1fr; }
-    .drawer{ grid-column: 1 / -1; width:100%; }
-  }
-</style>
 
 <div class="shell expanded">
   <div class="hero">
@@ -329,6 +259,7 @@ PICK_HTML = """
       <div class="pill"><span id="count">0</span> points</div>
     </div>
     <div class="stage" id="stage">
+      <canvas id="bg"></canvas>
       <canvas id="c"></canvas>
       <div class="crosshair" id="xh"><div class="h"></div><div class="v"></div></div>
       <div class="grid" id="grid"></div>
@@ -461,312 +392,8 @@ PICK_HTML = """
 
 
 
-<script>
-/* --------------------------- State & DOM refs --------------------------- */
-const frames   = {{ frames|tojson }};
-const legend   = document.getElementById('legend');
-const countEl  = document.getElementById('count');
-const miniCount= document.getElementById('miniCount');
-const listEl   = document.getElementById('list');
-const toast    = document.getElementById('toast');
-const coords   = document.getElementById('coords');
-const grid     = document.getElementById('grid');
-const c        = document.getElementById('c');
-const ctx      = c.getContext('2d');
-const stage    = document.getElementById('stage');
-const crosshair= document.getElementById('xh');
-
-const imgEl = new Image();
-let points = {};       // points[0] = [{x,y,l}, ...]
-let mode = 1;          // 1=POS, 0=NEG
-let scale = 1, panX = 0, panY = 0;
-let isPanning = false, panStartX = 0, panStartY = 0, worldStartX = 0, worldStartY = 0;
-let spaceDown = false;
-
-/* small ripple animation on click */
-const ripples = [];
-function addRipple(wx, wy, color){ ripples.push({x:wx, y:wy, r:0, color, alpha:0.35}); }
-const loadingOverlay = document.getElementById('loadingOverlay');
-const loadingLabel   = document.getElementById('loadingLabel');
-
-function setLoading(on, msg = 'Generating preview…') {
-  if (loadingOverlay) {
-    loadingOverlay.style.display = on ? 'flex' : 'none';
-  }
-  if (loadingLabel && msg) {
-    loadingLabel.textContent = msg;
-  }
-}
-
-/* ----------------------------- Init & Fit ------------------------------ */
-function loadFrame0(){
-  if (!frames.length){ legend.textContent = "No frames found"; return; }
-  const f = frames[0];
-  imgEl.onload = () => {
-    // canvas world size = image intrinsic size
-    c.width = imgEl.naturalWidth; c.height = imgEl.naturalHeight;
-    fitToStage(); redraw();
-    legend.textContent = "Annotating " + f.split('/').pop();
-  };
-  imgEl.src = "/frame?i=0";
-}
-
-function fitToStage(){
-  // Compute a scale that fits canvas inside the visible stage, centered
-  const box = stage.getBoundingClientRect();
-  const pad = 8;
-  const availW = Math.max(200, box.width  - pad*2);
-  const availH = Math.max(200, box.height - pad*2);
-  const sx = availW / c.width;
-  const sy = availH / c.height;
-  scale = Math.max(0.12, Math.min(sx, sy));
-  panX = (box.width  - c.width  * scale) / 2;
-  panY = (box.height - c.height * scale) / 2;
-}
-
-/* ------------------------------- Draw ---------------------------------- */
-function updateCount(){
-  const n = (points[0] || []).length;
-  countEl.textContent = n; miniCount.textContent = n;
-}
-function renderList(){
-  const arr = points[0] || [];
-  listEl.innerHTML = arr.map((p,i)=>`
-    <div class="row"><div>#${i+1} · ${p.l? 'POS':'NEG'}</div>
-    <div class="badge-mini">x:${p.x}, y:${p.y}</div></div>`).join('');
-}
-function redraw(){
-  if (!imgEl.complete) return;
-  ctx.setTransform(1,0,0,1,0,0); ctx.clearRect(0,0,c.width,c.height);
-  ctx.setTransform(scale,0,0,scale,panX,panY);
-  ctx.imageSmoothingEnabled = true;
-  ctx.drawImage(imgEl, 0, 0);
-
-  const arr = points[0] || [];
-  for (const p of arr){
-    ctx.beginPath(); ctx.arc(p.x, p.y, 7/scale, 0, 2*Math.PI);
-    ctx.lineWidth = 2/scale; ctx.strokeStyle = p.l ? "#34c759" : "#ff3b30"; ctx.stroke();
-    ctx.beginPath(); ctx.arc(p.x, p.y, 2.6/scale, 0, 2*Math.PI); ctx.fillStyle = p.l ? "#34c759" : "#ff3b30"; ctx.fill();
-  }
-  for (const r of ripples){
-    ctx.beginPath(); ctx.arc(r.x, r.y, (r.r)/scale, 0, 2*Math.PI);
-    ctx.lineWidth = 2/scale; ctx.strokeStyle = r.color.replace('1)', r.alpha + ')'); ctx.stroke();
-    r.r += 12; r.alpha *= 0.92;
-  }
-  for (let i = ripples.length-1; i>=0; i--){ if (ripples[i].alpha < 0.04) ripples.splice(i,1); }
-
-  updateCount(); renderList();
-}
-
-/* ------------------------- Coordinate helpers -------------------------- */
-function getCanvasScreenXY(e){ const r = c.getBoundingClientRect(); return { sx: e.clientX - r.left, sy: e.clientY - r.top }; }
-function screenToWorldCanvas(sx, sy){ return { x: Math.round((sx - panX)/scale), y: Math.round((sy - panY)/scale) }; }
-
-/* ------------------------------- Events -------------------------------- */
-new ResizeObserver(()=>{ fitToStage(); redraw(); }).observe(stage);
-
-// Crosshair + live coords (measured on canvas)
-c.addEventListener('mousemove', (e)=>{
-  const { sx, sy } = getCanvasScreenXY(e);
-  const w = screenToWorldCanvas(sx, sy);
-  const r = c.getBoundingClientRect(), sr = stage.getBoundingClientRect();
-  crosshair.style.setProperty('--x', `${(r.left - sr.left) + sx}px`);
-  crosshair.style.setProperty('--y', `${(r.top  - sr.top ) + sy}px`);
-  coords.textContent = `x: ${Math.max(0,Math.min(c.width, w.x))}, y: ${Math.max(0,Math.min(c.height, w.y))} | zoom: ${scale.toFixed(2)}×`;
-});
-
-// Wheel zoom anchored at cursor
-c.addEventListener('wheel', (e)=>{
-  if (!imgEl.complete) return;
-  e.preventDefault();
-  const { sx, sy } = getCanvasScreenXY(e);
-  const before = screenToWorldCanvas(sx, sy);
-  const newScale = Math.min(12, Math.max(0.1, scale * (1 - Math.sign(e.deltaY)*0.12)));
-  scale = newScale;
-  panX = sx - (before.x * scale);
-  panY = sy - (before.y * scale);
-  redraw();
-},{passive:false});
-
-// Space = pan mode
-window.addEventListener('keydown', (e)=>{ if (e.code === 'Space') spaceDown = true; });
-window.addEventListener('keyup',   (e)=>{ if (e.code === 'Space') spaceDown = false; });
-
-// Mouse down (pan or add point)
-c.addEventListener('mousedown', (e)=>{
-  const { sx, sy } = getCanvasScreenXY(e);
-  if (spaceDown){
-    isPanning = true; panStartX = sx; panStartY = sy; worldStartX = panX; worldStartY = panY; stage.style.cursor = 'grabbing'; return;
-  }
-  if (!points[0]) points[0] = [];
-  const w = screenToWorldCanvas(sx, sy);
-  const label = (e.button === 2) ? 0 : mode;  // right-click forces NEG
-  points[0].push({x: w.x, y: w.y, l: label});
-  addRipple(w.x, w.y, label ? 'rgba(52,199,89,1)' : 'rgba(255,59,48,1)');
-  redraw();
-});
-c.addEventListener('contextmenu', e => e.preventDefault());
-
-// Pan drag
-c.addEventListener('mousemove', (e)=>{
-  if (!isPanning) return;
-  const { sx, sy } = getCanvasScreenXY(e);
-  panX = worldStartX + (sx - panStartX);
-  panY = worldStartY + (sy - panStartY);
-  redraw();
-});
-window.addEventListener('mouseup', ()=>{ isPanning = false; stage.style.cursor = 'crosshair'; });
-
-// Undo
-function undo(){ if (!points[0] || !points[0].length) return; points[0].pop(); redraw(); }
-window.addEventListener('keydown', (e)=>{
-  const tgt = (e.target.tagName||'').toLowerCase();
-  if (tgt === 'input' || tgt === 'textarea' || e.isComposing) return;
-  const isUndo = (e.key === 'u' || e.key === 'U') || ((e.ctrlKey||e.metaKey) && e.key.toLowerCase()==='z');
-  if (isUndo){ e.preventDefault(); undo(); }
-});
-
-// Mode toggle
-const posBtn = document.getElementById('posBtn');
-const negBtn = document.getElementById('negBtn');
-posBtn.addEventListener('click', ()=>{ mode=1; posBtn.classList.add('active','pos'); negBtn.classList.remove('active'); });
-negBtn.addEventListener('click', ()=>{ mode=0; negBtn.classList.add('active','neg'); posBtn.classList.remove('active'); });
-
-// Grid & clear
-function toggleGrid(){ grid.classList.toggle('show'); }
-function clearAll(){ if (confirm('Clear all points?')){ points[0] = []; redraw(); } }
-
-// Save
-function showToast(msg="Saved"){ toast.textContent = msg; toast.classList.add('show'); setTimeout(()=>toast.classList.remove('show'), 1300); }
-const previewModal = document.getElementById('previewModal');
-const previewGrid  = document.getElementById('previewGrid');
-const doneOverlay  = document.getElementById('doneOverlay');
-
-
-async function save(){
-  const payload = { points };
-  showToast('Generating preview…');
-  setLoading(true, 'Generating preview…');
-
-  try{
-    const r = await fetch('/save', {
-      method:'POST',
-      headers:{'Content-Type':'application/json'},
-      body: JSON.stringify(payload)
-    });
-
-    if (!r.ok){
-      showToast('Save failed');
-      alert('Save failed: ' + await r.text());
-      return;
-    }
-
-    const data = await r.json();
-    if (!data.ok){
-      showToast('Save failed');
-      alert('Save failed: ' + (data.error || 'Unknown error'));
-      return;
-    }
-
-    // data.previews = ["/preview/....png", ...]
-    const previews = data.previews || [];
-        if (!previews.length){
-          showToast('No preview generated');
-          alert('No preview images generated. Check the backend preview logic.');
-          return;
-        }
-
-
-        const main = previews[0];
-        const thumbs = previews.slice(1);  // random 5
-
-        let html = "";
-
-    
-        html += `
-          <div style="border-radius:14px; overflow:hidden;
-                      border:1px solid rgba(255,255,255,0.18);
-                      background:#000;">
-            <img src="${main}"
-                style="display:block; width:100%; max-height:420px;
-                        object-fit:contain;">
-          </div>
-        `;
-
-        
-        if (thumbs.length){
-          html += `
-            <div style="display:flex; flex-wrap:wrap; gap:10px;">
-              ${thumbs.map(url => `
-                <div style="flex:1 1 160px; max-width:220px;
-                            border-radius:12px; overflow:hidden;
-                            border:1px solid rgba(255,255,255,0.12);
-                            background:#000;">
-                  <img src="${url}" style="display:block; width:100%; height:auto;">
-                </div>
-              `).join('')}
-            </div>
-          `;
-        }
-
-    previewGrid.innerHTML = html;
-
-
-    // Show modal
-    previewModal.style.display = 'flex';
-    setLoading(false);
-    showToast('Preview ready');
-
-
-  }catch(err){
-    setLoading(false);
-    showToast('Save failed');
-    alert('Save failed: ' + err);
-  }
-}
-document.getElementById('confirmBtn').addEventListener('click', async () => {
-  try{
-    const r = await fetch('/confirm', { method:'POST' });
-    const data = await r.json();
-    if (!r.ok || !data.ok){
-      alert('Failed to confirm: ' + (data.error || 'unknown'));
-      return;
-    }
-   
-    previewModal.style.display = 'none';
-    showToast('Confirmed');
-    doneOverlay.style.display = 'flex';
-  }catch(err){
-    alert('Failed to confirm: ' + err);
-  }
-});
-
-document.getElementById('restartBtn').addEventListener('click', async () => {
-  if (!confirm('Discard these prompts and start over?')) return;
-  try{
-    const r = await fetch('/restart', { method:'POST' });
-    const data = await r.json();
-    if (!r.ok || !data.ok){
-      alert('Failed to restart: ' + (data.error || 'unknown'));
-      return;
-    }
-    showToast('Restarted');
-    previewModal.style.display = 'none';
-    // Clear all points locally too
-    points[0] = [];
-    redraw();
-  }catch(err){
-    alert('Failed to restart: ' + err);
-  }
-});
-
-
-
-// Start
-function tick(){ requestAnimationFrame(tick); if (ripples.length) redraw(); }
-tick(); loadFrame0();
-
-</script>
+<script>window.PICKER = JSON.parse({{ picker_cfg|tojson|tojson }});</script>
+<script src="/static/picker.js" defer></script>
 """
 DONE_HTML = """
   <!doctype html><meta charset="utf-8">
@@ -834,21 +461,164 @@ DONE_HTML = """
 
 app = Flask(__name__)
 
+# Flask's own template machinery is unused (the UI lives in the inline
+# strings above), so keep its auto-reload off as well.
+app.config["TEMPLATES_AUTO_RELOAD"] = False
+app.jinja_env.auto_reload = False
+
+# Static assets (picker.css / picker.js) never change within a deployment;
+# let browsers cache them hard.
+app.config["SEND_FILE_MAX_AGE_DEFAULT"] = 31536000
+
+# Dedicated environment for the inline templates. With a DictLoader,
+# auto_reload=False and an unbounded cache, each template is lexed, parsed
+# and compiled exactly once per process; the loop below pre-warms them so
+# the first request does not pay the compile either.
+_JINJA_CACHE_DIR = INDEXED_DIR / "__jinja_cache"
+_JINJA_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
 
-def gather_frames(dir_path: Path | str) -> List[str]:
+def _minify_template(src: str) -> str:
+    """
+    Minify one inline template once at import time. The indentation in the
+    template strings otherwise goes through Jinja, gzip and the wire on
+    every response. minify-html does a proper job when installed; the
+    fallback just drops per-line indentation and blank lines, which is safe
+    for these templates (no inline JS relies on line structure).
+    """
+    if minify_html is not None:
+        try:
+            return minify_html.minify(src, minify_css=True)
+        except Exception:
+            pass
+    return "\n".join(
+        line for line in (ln.strip() for ln in src.splitlines()) if line
+    )
+
+
+ENV = jinja2.Environment(
+    loader=jinja2.DictLoader(
+        {
+            "home": _minify_template(HOME_HTML),
+            "pick": _minify_template(PICK_HTML),
+            "done": _minify_template(DONE_HTML),
+        }
+    ),
+    # Match render_template_string's behavior: path/env-derived strings
+    # ({{ds}}, {{prompts}}, ...) must not land in the HTML unescaped.
+    autoescape=True,
+    auto_reload=False,
+    cache_size=-1,
+    # Persist compiled template code objects on disk so a restarted process
+    # unpickles them instead of re-running the parser over PICK_HTML.
+    bytecode_cache=jinja2.FileSystemBytecodeCache(str(_JINJA_CACHE_DIR)),
+)
+for _name in ("home", "pick", "done"):
+    ENV.get_template(_name)
+
+
+def _render(name: str, **ctx: object) -> str:
+    """Render one of the pre-compiled inline templates by name."""
+    return ENV.get_template(name).render(**ctx)
+
+
+@functools.lru_cache(maxsize=16)
+def _compress_html(body: bytes, encoding: str) -> bytes:
+    """Compress a rendered HTML body once; repeat renders hit the cache."""
+    if encoding == "br":
+        # Maximum quality: expensive once, then amortized over every
+        # request serving this variant from the cache.
+        return brotli.compress(body, quality=11)
+    return gzip.compress(body, 9)
+
+
+@functools.lru_cache(maxsize=16)
+def _html_etag(body: bytes) -> str:
+    """Strong ETag for a rendered (uncompressed) HTML body."""
+    return hashlib.blake2b(body, digest_size=8).hexdigest()
+
+
+@app.after_request
+def _negotiate_html_encoding(response):
+    """
+    Serve HTML gzip/brotli-compressed according to Accept-Encoding, with a
+    content ETag so unchanged pages revalidate to a bodyless 304.
+    The inline templates are large (Apple-like CSS in every page), and the
+    compressed bodies are cached so the compressor runs once per variant.
+    """
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.mimetype != "text/html"
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+
+    body = response.get_data()
+    response.set_etag(_html_etag(body))
+    response.headers["Cache-Control"] = "private, must-revalidate"
+    # These URLs serve encoded variants, so caches must key on
+    # Accept-Encoding even when this particular response skips
+    # compression below.
+    response.headers.add("Vary", "Accept-Encoding")
+
+    accepted = request.accept_encodings
+    encoding = None
+    if brotli is not None and accepted.quality("br") > 0:
+        encoding = "br"
+    elif accepted.quality("gzip") > 0:
+        encoding = "gzip"
+    if encoding is not None and len(body) >= 1024:
+        response.set_data(_compress_html(body, encoding))
+        response.headers["Content-Encoding"] = encoding
+
+    # Turns the response into a bodyless 304 -- carrying the ETag and
+    # Vary headers -- when the client's validator still matches.
+    return response.make_conditional(request)
+
+
+_FRAME_EXTS = (".jpg", ".jpeg", ".png")
+
+
+@functools.lru_cache(maxsize=4)
+def _list_frames(dir_path: str, mtime_ns: int) -> tuple[str, ...]:
+    """
+    Directory listing memoized on (path, mtime): as long as the directory
+    is untouched the cached tuple is returned without any dirent walk.
+    A single os.scandir pass replaces the per-pattern glob calls; the
+    dirent carries the file type, so no per-entry stat is issued.
+    """
+    try:
+        with os.scandir(dir_path) as it:
+            return tuple(
+                sorted(
+                    e.path
+                    for e in it
+                    if e.name.lower().endswith(_FRAME_EXTS)
+                    # follow symlinks: the indexer may populate the
+                    # _indexed directory with them when hardlinks fail
+                    and e.is_file()
+                )
+            )
+    except OSError:
+        return ()
+
+
+def gather_frames(dir_path: Path | str) -> list[str]:
     """
     Collect image files from a directory (jpg/jpeg/png, case-insensitive).
-    Returns absolute paths sorted lexicographically.
+    Returns absolute paths sorted lexicographically. A single stat() call
+    is the only per-call filesystem work when the directory is unchanged.
     """
     p = Path(dir_path)
-    patterns = ("*.jpg", "*.jpeg", "*.png", "*.JPG", "*.JPEG", "*.PNG")
-    files: List[str] = []
-    for pat in patterns:
-        files.extend([str(f) for f in p.glob(pat)])
-    return sorted(files)
+    try:
+        mtime_ns = p.stat().st_mtime_ns
+    except OSError:
+        return []
+    return list(_list_frames(str(p), mtime_ns))
 
 
-def resolve_frames() -> List[str]:
+def resolve_frames() -> list[str]:
     """
     Try INPUT first (e.g. /data/in/dress).
     If empty, also try <INPUT>_indexed (e.g. /data/in/dress_indexed).
@@ -860,8 +630,64 @@ def resolve_frames() -> List[str]:
     return frames
 
 
-FRAMES: List[str] = resolve_frames()
-def run_preview_masks(num_frames: int = 6) -> List[str]:
+FRAMES: list[str] = resolve_frames()
+
+
+def _downscale_previews() -> None:
+    """
+    Downscale every preview to PREVIEW_MAX_W with one batched ffmpeg call.
+    A single invocation amortizes ffmpeg's cold start over the whole preview
+    set instead of paying it once per image. No-op when PREVIEW_MAX_W is 0,
+    ffmpeg is missing, or no previews were written.
+    """
+    if PREVIEW_MAX_W <= 0 or shutil.which("ffmpeg") is None:
+        return
+    srcs = sorted(PREVIEW_DIR.glob("*.jpg"))
+    if not srcs:
+        return
+
+    scratch = PREVIEW_DIR / "__scaled"
+    scratch.mkdir(exist_ok=True)
+    cmd = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-pattern_type", "glob", "-i", str(PREVIEW_DIR / "*.jpg"),
+        "-vf", f"scale='min({PREVIEW_MAX_W},iw)':-2",
+        "-q:v", "5",
+        str(scratch / "%06d.jpg"),
+    ]
+    try:
+        pid = os.posix_spawnp(cmd[0], cmd, os.environ)
+        _, status = os.waitpid(pid, 0)
+        if os.waitstatus_to_exitcode(status) != 0:
+            raise OSError("ffmpeg failed")
+    except OSError as e:
+        print(f"[preview] batched downscale skipped: {e}", flush=True)
+        shutil.rmtree(scratch, ignore_errors=True)
+        return
+
+    # ffmpeg's glob input and %06d output are both sorted, so positions map.
+    scaled = sorted(scratch.glob("*.jpg"))
+    if len(scaled) == len(srcs):
+        for src, sc in zip(srcs, scaled):
+            os.replace(sc, src)
+    shutil.rmtree(scratch, ignore_errors=True)
+
+# Materialized once at startup: /frame is hit once per image by the picker,
+# so the handler must not re-glob the dataset or rebuild Path objects.
+FRAME_PATHS: list[Path] = [Path(p) for p in FRAMES]
+
+# Directory fd for the frames dir. Opening frames with openat(2) relative to
+# this fd resolves the directory components once at startup instead of on
+# every /frame request.
+try:
+    _FRAMES_DIRFD: int | None = (
+        os.open(str(FRAME_PATHS[0].parent), os.O_RDONLY | os.O_DIRECTORY)
+        if FRAME_PATHS
+        else None
+    )
+except OSError:
+    _FRAMES_DIRFD = None
+def run_preview_masks(num_frames: int = 6) -> list[str]:
     """
     Run a small SAM2 preview:
       - reads prompts.json in OUT_ROOT
@@ -869,48 +695,275 @@ def run_preview_masks(num_frames: int = 6) -> List[str]:
       - writes color cutouts into PREVIEW_DIR
 
     Returns: list of filenames (just the name, e.g. "000000.jpg").
+
+    PREVIEW_DIR is NOT cleared here: the caller does that before handing
+    control to the background thread, so /save_stream never streams (and
+    then deletes) the previous run's files.
     """
 
-    # Clear previous previews
-    for f in PREVIEW_DIR.glob("*"):
+    # Preferred path: run the preview in-process. video_predict caches the
+    # SAM2 predictor in a module singleton, so repeated save/restart
+    # cycles skip the torch import, CUDA context init and weight load a
+    # fresh subprocess pays every time. PREVIEW_IN_PROCESS=0 forces the
+    # subprocess, which also serves as the fallback when the import or the
+    # run itself fails (e.g. no GPU in this process).
+    if os.environ.get("PREVIEW_IN_PROCESS", "1") == "1":
         try:
-            f.unlink()
-        except Exception:
-            pass
+            import video_predict
 
+            video_predict.run_sam2(
+                preview=True,
+                preview_num_frames=num_frames,
+                preview_out=str(PREVIEW_DIR),
+            )
+        except Exception as e:
+            print(f"[preview] in-process run failed ({e}); using subprocess", flush=True)
+        else:
+            _downscale_previews()
+            previews = _scan_previews()
+            print(f"[preview] found {len(previews)} preview files", flush=True)
+            return previews
+
+    # Absolute script path: the CWD is /workspace under run_pipeline.sh
+    # but the app dir under gunicorn (--chdir), so a relative path would
+    # silently miss the script in one of the two.
     cmd = [
         "python3",
-        "app/video_predict.py",
+        str(Path(__file__).resolve().parent / "video_predict.py"),
         "--preview",
         "--preview-num-frames", str(num_frames),
         "--preview-out", str(PREVIEW_DIR),
     ]
 
     
-    env = os.environ.copy()
-    env["QUIET"] = "0"
-
     try:
         print(f"[preview] running: {' '.join(cmd)}  -> {PREVIEW_DIR}", flush=True)
-        subprocess.run(cmd, check=True, env=env)
-    except subprocess.CalledProcessError as e:
-        print(f"[preview] video_predict.py failed: {e}", flush=True)
+        # posix_spawn issues a single spawn syscall instead of fork+exec,
+        # skipping the copy-on-write duplication of this Flask process.
+        pid = os.posix_spawnp(cmd[0], cmd, _PREVIEW_ENV)
+        _, status = os.waitpid(pid, 0)
+        exitcode = os.waitstatus_to_exitcode(status)
+        if exitcode != 0:
+            print(f"[preview] video_predict.py failed with exit code {exitcode}", flush=True)
+            return []
+    except OSError as e:
+        print(f"[preview] could not spawn video_predict.py: {e}", flush=True)
         return []
 
-    # Collect the files that were written into PREVIEW_DIR
-    previews: List[str] = []
-    for ext in ("*.png", "*.jpg", "*.jpeg", "*.PNG", "*.JPG", "*.JPEG"):
-        for f in sorted(PREVIEW_DIR.glob(ext)):
-            previews.append(f.name)   
+    _downscale_previews()
 
+    previews = _scan_previews()
     print(f"[preview] found {len(previews)} preview files", flush=True)
     return previews
 
 
+def _clear_previews() -> None:
+    """Delete whatever is currently in PREVIEW_DIR."""
+    for f in PREVIEW_DIR.glob("*"):
+        try:
+            f.unlink()
+        except Exception:
+            pass
+
+
+def _scan_previews() -> list[str]:
+    """List the image files currently present in PREVIEW_DIR."""
+    previews: list[str] = []
+    for ext in ("*.png", "*.jpg", "*.jpeg", "*.PNG", "*.JPG", "*.JPEG"):
+        for f in sorted(PREVIEW_DIR.glob(ext)):
+            previews.append(f.name)
+    return previews
+
+
+# Preview generation runs on a background thread so /save can return
+# immediately; /save_stream pushes progress to the client over SSE.
+# The lock serializes runs (each one clears PREVIEW_DIR first).
+_PREVIEW_LOCK = threading.Lock()
+_PREVIEW_THREAD: threading.Thread | None = None
+_PREVIEW_RESULT: list[str] = []
+
+
+def _start_preview_thread(num_frames: int = 6) -> None:
+    """Launch run_preview_masks on a daemon thread."""
+    global _PREVIEW_THREAD
+
+    def _worker() -> None:
+        global _PREVIEW_RESULT
+        with _PREVIEW_LOCK:
+            _PREVIEW_RESULT = run_preview_masks(num_frames=num_frames)
+
+    _PREVIEW_THREAD = threading.Thread(target=_worker, daemon=True)
+    _PREVIEW_THREAD.start()
+
+
+
+
+
+if msgspec is not None:
+
+    class _Pt(msgspec.Struct):
+        """One picked point as sent by the picker JS."""
+
+        x: float
+        y: float
+        l: int
+
+    class _SavePayload(msgspec.Struct):
+        """Body of POST /save: points keyed by frame index (as string)."""
+
+        points: dict[str, list[_Pt]] = msgspec.field(default_factory=dict)
+
+    _SAVE_DECODER = msgspec.json.Decoder(_SavePayload)
+
+
+def _parse_save_points(raw: bytes, frame_idx: int) -> tuple[list[list[float]], list[int]]:
+    """
+    Extract (points, labels) for one frame from the /save request body.
+    With msgspec installed, parse and schema check happen in a single C
+    pass; otherwise fall back to _loads plus a manual extraction loop.
+    Malformed bodies yield empty lists (the caller applies its fallback).
+    """
+    if msgspec is not None:
+        try:
+            payload = _SAVE_DECODER.decode(raw)
+        except msgspec.DecodeError:
+            return [], []
+        arr = payload.points.get(str(frame_idx), [])
+        return [[float(p.x), float(p.y)] for p in arr], [int(p.l) for p in arr]
+
+    try:
+        data = _loads(raw)
+    except Exception:
+        data = {}
+    points_dict = data.get("points", {}) if isinstance(data, dict) else {}
+    # Clients may use numeric or string keys ("0")
+    raw_arr = points_dict.get(str(frame_idx), points_dict.get(frame_idx, []))
+    pts: list[list[float]] = []
+    labs: list[int] = []
+    for p in raw_arr:
+        pts.append([float(p["x"]), float(p["y"])])
+        labs.append(int(p["l"]))
+    return pts, labs
+
 
+# One picker point on the wire: little-endian int32 x, int32 y, uint8 label.
+_POINT_STRUCT = struct.Struct("<iiB")
 
 
-def _json_ok(**payload: Any):
+def _parse_save_points_binary(raw: bytes) -> tuple[list[list[float]], list[int]]:
+    """
+    Decode the packed binary /save body (one _POINT_STRUCT record per
+    point). Truncated or misaligned bodies yield empty lists, matching the
+    JSON parser's behaviour for malformed input.
+    """
+    if not raw or len(raw) % _POINT_STRUCT.size:
+        return [], []
+    pts: list[list[float]] = []
+    labs: list[int] = []
+    for x, y, lab in _POINT_STRUCT.iter_unpack(raw):
+        pts.append([float(x), float(y)])
+        labs.append(int(lab))
+    return pts, labs
+
+
+def _dumps(obj: object) -> bytes:
+    """
+    Serialize to pretty-printed, newline-terminated JSON bytes.
+    Uses orjson when installed (much faster), stdlib json otherwise.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE)
+    return json.dumps(obj, indent=2).encode("utf-8") + b"\n"
+
+
+def _loads(data: bytes) -> object:
+    """Parse JSON bytes with orjson when installed, stdlib json otherwise."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _frame_etag(fp: Path) -> str:
+    """Cheap strong ETag for an on-disk frame (name + mtime + size)."""
+    st = fp.stat()
+    return hashlib.blake2b(
+        f"{fp.name}:{st.st_mtime_ns}:{st.st_size}".encode(), digest_size=8
+    ).hexdigest()
+
+
+def _send_frame_file(directory: Path, name: str, dir_fd: int | None = None):
+    """
+    Serve a static image either through Flask or, when USE_XACCEL is set,
+    via an X-Accel-Redirect header so the reverse proxy serves the bytes.
+    When a dir_fd is given, the file is opened relative to it (openat) so
+    the directory path is not re-resolved per request.
+    """
+    joined = safe_join(str(directory), name)
+    if joined is None:
+        return _json_err("Not found", http=404)
+
+    if USE_XACCEL:
+        resp = Response(status=200)
+        resp.headers["X-Accel-Redirect"] = f"{NGINX_INTERNAL_PREFIX}{joined}"
+        ctype = mimetypes.guess_type(name)[0]
+        if ctype:
+            resp.headers["Content-Type"] = ctype
+        return resp
+
+    # Serve the bytes ourselves: a big buffer + werkzeug's file wrapper lets
+    # the WSGI server take its sendfile/zero-copy path instead of ~8 KiB
+    # read/write pairs per multi-MB JPEG.
+    if dir_fd is not None:
+        fd = os.open(name, os.O_RDONLY, dir_fd=dir_fd)
+        f = os.fdopen(fd, "rb", buffering=_SEND_BUFFER_SIZE)
+        size = os.fstat(fd).st_size
+    else:
+        fp = Path(joined)
+        f = open(fp, "rb", buffering=_SEND_BUFFER_SIZE)
+        size = fp.stat().st_size
+    resp = Response(
+        wrap_file(request.environ, f, buffer_size=_SEND_BUFFER_SIZE),
+        mimetype=mimetypes.guess_type(name)[0] or "application/octet-stream",
+        direct_passthrough=True,
+    )
+    resp.content_length = size
+    return resp
+
+
+# -----------------------------------------------------------------------------
+# Picker state
+# -----------------------------------------------------------------------------
+# run_pipeline.sh polls the two flag files, so they stay the external
+# contract. In-process the same two bits live in a single bitmask that is
+# mirrored to disk on every transition; handlers read the in-memory value
+# instead of stat()ing the flags (this process is the only writer).
+
+STATE_DONE = 0x1
+STATE_USE_EXISTING = 0x2
+
+_state = (STATE_DONE if DONE_FLAG.exists() else 0) | (
+    STATE_USE_EXISTING if USE_EXISTING.exists() else 0
+)
+
+
+def _set_state(bit: int, on: bool) -> None:
+    """Flip one state bit and mirror it to the matching flag file."""
+    global _state
+    flag = DONE_FLAG if bit == STATE_DONE else USE_EXISTING
+    if on:
+        _state |= bit
+        flag.touch()
+    else:
+        _state &= ~bit
+        flag.unlink(missing_ok=True)
+
+
+def _has_state(bit: int) -> bool:
+    """Check a state bit without touching the filesystem."""
+    return bool(_state & bit)
+
+
+def _json_ok(**payload: object):
     return jsonify({"ok": True, **payload})
 
 
@@ -922,6 +975,24 @@ def _json_err(msg: str, http: int = 400):
 # Routes
 # =============================================================================
 
+@functools.lru_cache(maxsize=8)
+def _render_home(has_existing: bool) -> str:
+    """
+    Memoized home render. Everything in the page except the
+    'prompts.json exists' flag is fixed for the process lifetime, and the
+    flag is part of the cache key, so no explicit invalidation is needed.
+    """
+    return _render(
+        "home",
+        ds=DS_NAME,
+        nframes=len(FRAMES),
+        exists=has_existing,
+        prompts=CFG.prompts_json,
+        done=CFG.done_flag,
+        use_existing=CFG.use_existing,
+    )
+
+
 @app.route("/")
 def home():
     """
@@ -929,15 +1000,7 @@ def home():
     - Use existing prompts.json (if present)
     - Create new (opens picker)
     """
-    return render_template_string(
-        HOME_HTML,
-        ds=DS_NAME,
-        nframes=len(FRAMES),
-        exists=PROMPTS_JSON.is_file(),
-        prompts=str(PROMPTS_JSON),
-        done=str(DONE_FLAG),
-        use_existing=str(USE_EXISTING),
-    )
+    return _render_home(PROMPTS_JSON.is_file())
 
 
 @app.post("/use_existing")
@@ -946,14 +1009,14 @@ def use_existing():
     User chose to reuse existing prompts.json.
     We set USE_EXISTING + DONE_FLAG and show a nice “done” screen.
     """
-    USE_EXISTING.touch()
-    DONE_FLAG.touch()
-    return render_template_string(
-        DONE_HTML,
+    _set_state(STATE_USE_EXISTING, True)
+    _set_state(STATE_DONE, True)
+    return _render(
+        "done",
         ds=DS_NAME,
-        prompts=str(PROMPTS_JSON),
-        done=str(DONE_FLAG),
-        use_existing=str(USE_EXISTING),
+        prompts=CFG.prompts_json,
+        done=CFG.done_flag,
+        use_existing=CFG.use_existing,
     )
 
 
@@ -965,7 +1028,7 @@ def create_new():
     """
     try:
         PROMPTS_JSON.unlink(missing_ok=True)
-        USE_EXISTING.unlink(missing_ok=True)
+        _set_state(STATE_USE_EXISTING, False)
     except Exception as e:
         return _json_err(str(e), http=500)
     return redirect("/pick")
@@ -977,13 +1040,18 @@ def pick():
     Interactive picker view (Apple-like).
     Loads only the list of frames to show the first image.
     """
-    names = [Path(p).name for p in FRAMES]
-    return render_template_string(
-        PICK_HTML,
-        frames=FRAMES,
+    # The client only ever shows frame 0; shipping the whole frame list
+    # would serialize megabytes of JSON on large datasets for nothing.
+    first = Path(FRAMES[0]).name if FRAMES else ""
+    return _render(
+        "pick",
+        # Double-encoded so the page embeds a JSON string fed to
+        # JSON.parse(), which browsers parse much faster than an
+        # equivalent JS object literal.
+        picker_cfg={"frame0": first, "nframes": len(FRAMES)},
         idx=1,
         total=len(FRAMES),
-        name=names[0] if names else "",
+        name=first,
     )
 
 
@@ -995,7 +1063,23 @@ def preview_image(name: str):
     fp = PREVIEW_DIR / name
     if not fp.is_file():
         return _json_err("Preview image not found", http=404)
-    return send_from_directory(PREVIEW_DIR, fp.name)
+
+    # Previews are regenerated whenever prompts change, so they cannot be
+    # immutable like source frames -- but the (mtime, size) ETag still lets
+    # a reload answer with a bodyless 304 when nothing changed. A preview
+    # can also vanish between the is_file() check and the stat/open when a
+    # new run clears the directory -- that's a 404, not a 500.
+    try:
+        etag = _frame_etag(fp)
+        if etag in request.if_none_match:
+            return Response(status=304)
+
+        resp = _send_frame_file(PREVIEW_DIR, fp.name)
+    except FileNotFoundError:
+        return _json_err("Preview image not found", http=404)
+    resp.set_etag(etag)
+    resp.cache_control.no_cache = True
+    return resp
 
 
 
@@ -1012,19 +1096,28 @@ def save():
     if not FRAMES:
         return _json_err("No frames found", http=400)
 
-    try:
-        data = request.get_json(force=True, silent=True) or {}
-        points_dict: Dict[str, List[Dict[str, int]]] = data.get("points", {})
-        frame_idx = 0
+    # Once /confirm has set DONE the runner is already consuming
+    # prompts.json; rewriting it now would race the pipeline. The session
+    # must go through /restart first (which clears the bit).
+    if _has_state(STATE_DONE):
+        return _json_err("Session already confirmed; restart to pick again", http=409)
 
-        # Clients may use numeric or string keys ("0")
-        raw_arr = points_dict.get(str(frame_idx), points_dict.get(frame_idx, []))
-        pts: List[List[float]] = []
-        labs: List[int] = []
+    # A preview run still in flight keeps writing into PREVIEW_DIR, so
+    # clearing it now would interleave two runs' files (and the leftovers
+    # would be streamed as if they belonged to the new prompts). Make the
+    # client retry once the current run has finished.
+    if _PREVIEW_THREAD is not None and _PREVIEW_THREAD.is_alive():
+        return _json_err("Preview still running; retry when it finishes", http=409)
 
-        for p in raw_arr:
-            pts.append([float(p["x"]), float(p["y"])])
-            labs.append(int(p["l"]))
+    try:
+        frame_idx = 0
+        raw = request.get_data(cache=False)
+        if (request.content_type or "").startswith("application/octet-stream"):
+            # Compact binary payload: no JSON encode on the client, no JSON
+            # parse here -- just a fixed-stride unpack.
+            pts, labs = _parse_save_points_binary(raw)
+        else:
+            pts, labs = _parse_save_points(raw or b"{}", frame_idx)
 
         # Read image size for metadata and fallback center
         from PIL import Image
@@ -1037,8 +1130,11 @@ def save():
             labs = [1]
 
         PROMPTS_JSON.parent.mkdir(parents=True, exist_ok=True)
-        with PROMPTS_JSON.open("w", encoding="utf-8") as f:
-            json.dump(
+        # Single unbuffered write of the whole blob, then an atomic rename so
+        # the pipeline never observes a half-written prompts.json.
+        tmp = PROMPTS_JSON.with_suffix(".json.tmp")
+        tmp.write_bytes(
+            _dumps(
                 {
                     "frame_idx": int(frame_idx),
                     "obj_id": 1,
@@ -1047,21 +1143,56 @@ def save():
                     "image_w": int(w),
                     "image_h": int(h),
                     "source": Path(FRAMES[frame_idx]).name,
-                },
-                f,
-                indent=2,
+                }
             )
-
-        # --- NEW: run preview masks on 1+5 frames ---
-        preview_files = run_preview_masks(num_frames=6)
-        preview_urls = [f"/preview/{name}" for name in preview_files]
-
-        # DO NOT touch DONE_FLAG here; we wait for /confirm
-        return _json_ok(path=str(PROMPTS_JSON), previews=preview_urls)
+        )
+        os.replace(tmp, PROMPTS_JSON)
+
+        # Kick the 1+5 frame preview off in the background. The client
+        # follows progress over /save_stream instead of blocking here for
+        # the whole SAM2 run. DO NOT touch DONE_FLAG; we wait for /confirm.
+        # Clear stale previews *before* returning: once /save has
+        # answered, /save_stream may poll PREVIEW_DIR at any moment and
+        # must never see (then lose) the previous run's files.
+        _clear_previews()
+        _start_preview_thread(num_frames=6)
+        return _json_ok(path=str(PROMPTS_JSON), stream="/save_stream")
 
     except Exception as e:
         return _json_err(str(e), http=500)
 
+
+@app.get("/save_stream")
+def save_stream():
+    """
+    Server-sent events for the preview run started by /save: one "frame"
+    event per preview image as it lands in PREVIEW_DIR, then a "done"
+    event carrying the full ordered URL list.
+    """
+
+    def gen():
+        seen: set[str] = set()
+        thread = _PREVIEW_THREAD
+        # Most of the wait is the SAM2 subprocess cold start (torch import,
+        # CUDA context, weight load), during which no files appear yet --
+        # tell the client the run is alive rather than stalled.
+        yield "event: status\ndata: running\n\n"
+        while thread is not None and thread.is_alive():
+            for name in _scan_previews():
+                if name not in seen:
+                    seen.add(name)
+                    yield f"event: frame\ndata: /preview/{name}\n\n"
+            time.sleep(0.25)
+        urls = [f"/preview/{name}" for name in _PREVIEW_RESULT]
+        payload = json.dumps(urls)
+        yield f"event: done\ndata: {payload}\n\n"
+
+    return Response(
+        gen(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.post("/confirm")
 def confirm():
     """
@@ -1069,7 +1200,7 @@ def confirm():
     creating DONE_FLAG.
     """
     try:
-        DONE_FLAG.touch()
+        _set_state(STATE_DONE, True)
         return _json_ok(msg="confirmed")
     except Exception as e:
         return _json_err(str(e), http=500)
@@ -1083,14 +1214,10 @@ def restart():
     """
     try:
         PROMPTS_JSON.unlink(missing_ok=True)
-        for f in PREVIEW_DIR.glob("*"):
-            try:
-                f.unlink()
-            except Exception:
-                pass
+        _clear_previews()
         # Also ensure flags are clean
-        DONE_FLAG.unlink(missing_ok=True)
-        USE_EXISTING.unlink(missing_ok=True)
+        _set_state(STATE_DONE, False)
+        _set_state(STATE_USE_EXISTING, False)
         return _json_ok(msg="restarted")
     except Exception as e:
         return _json_err(str(e), http=500)
@@ -1106,11 +1233,23 @@ def frame():
     except ValueError:
         return _json_err("Invalid frame index", http=400)
 
-    if idx < 0 or idx >= len(FRAMES):
+    if idx < 0 or idx >= len(FRAME_PATHS):
         return _json_err("Frame index out of range", http=404)
 
-    fp = Path(FRAMES[idx])
-    return send_from_directory(fp.parent, fp.name)
+    fp = FRAME_PATHS[idx]
+
+    # Source frames never change for the lifetime of a picker session, so
+    # mark them immutable and answer revalidations with a bodyless 304.
+    etag = _frame_etag(fp)
+    if etag in request.if_none_match:
+        return Response(status=304)
+
+    resp = _send_frame_file(fp.parent, fp.name, dir_fd=_FRAMES_DIRFD)
+    resp.set_etag(etag)
+    resp.cache_control.public = True
+    resp.cache_control.max_age = 31536000
+    resp.cache_control.immutable = True
+    return resp
 
 
 # =============================================================================
@@ -1118,5 +1257,21 @@ def frame():
 # =============================================================================
 
 if __name__ == "__main__":
+    # Prefer a threaded preforked WSGI server when available: the picker
+    # fans out many concurrent /frame GETs that Werkzeug's dev server would
+    # serialize. Opt out with USE_GUNICORN=0.
+    if os.environ.get("USE_GUNICORN", "1") == "1" and shutil.which("gunicorn"):
+        os.execvp(
+            "gunicorn",
+            [
+                "gunicorn",
+                "-b", "0.0.0.0:5000",
+                "--worker-class", "gthread",
+                "--threads", "8",
+                "--worker-tmp-dir", "/dev/shm",
+                "--chdir", str(Path(__file__).resolve().parent),
+                "point_picker_flask:app",
+            ],
+        )
     # NOTE: Keep debug=False for Docker usage; change locally if desired.
-    app.run(host="0.0.0.0", port=5000, debug=False)
+    app.run(host="0.0.0.0", port=5000, debug=False, threaded=True)
@@ -0,0 +1,424 @@
+/* --------------------------- State & DOM refs --------------------------- */
+const frame0   = window.PICKER.frame0;
+const nframes  = window.PICKER.nframes;
+const legend   = document.getElementById('legend');
+const countEl  = document.getElementById('count');
+const miniCount= document.getElementById('miniCount');
+const listEl   = document.getElementById('list');
+const toast    = document.getElementById('toast');
+const coords   = document.getElementById('coords');
+const grid     = document.getElementById('grid');
+const c        = document.getElementById('c');
+const ctx      = c.getContext('2d');
+const bgc      = document.getElementById('bg');
+const bctx     = bgc.getContext('2d');
+const stage    = document.getElementById('stage');
+const crosshair= document.getElementById('xh');
+
+let imgBitmap = null;  // decoded, GPU-ready frame (see loadFrame0)
+let imgW = 0, imgH = 0; // world (image) size; backing stores track the stage
+// Frame-0 points as parallel typed arrays (SoA): no per-point object
+// allocation and tight, cache-friendly iteration in redraw().
+let px = new Int32Array(1024), py = new Int32Array(1024);
+let pl = new Uint8Array(1024);
+let np = 0;
+function growPoints(){
+  const nx = new Int32Array(px.length * 2); nx.set(px); px = nx;
+  const ny = new Int32Array(py.length * 2); ny.set(py); py = ny;
+  const nl = new Uint8Array(pl.length * 2); nl.set(pl); pl = nl;
+}
+let mode = 1;          // 1=POS, 0=NEG
+let scale = 1, panX = 0, panY = 0;
+
+// Point colours, hoisted so repaints reuse the same style strings.
+const POS_COLOR = "#34c759", NEG_COLOR = "#ff3b30";
+const POS_RGBA  = 'rgba(52,199,89,1)', NEG_RGBA = 'rgba(255,59,48,1)';
+let isPanning = false, panStartX = 0, panStartY = 0, worldStartX = 0, worldStartY = 0;
+let spaceDown = false;
+
+/* small ripple animation on click */
+const ripples = [];
+let rippleRaf = null;
+function scheduleRipple(){
+  // On-demand rAF: the loop lives only while a ripple is animating, so an
+  // idle picker schedules zero frames instead of waking the compositor 60x/s.
+  if (rippleRaf) return;
+  rippleRaf = requestAnimationFrame(()=>{
+    rippleRaf = null;
+    if (ripples.length){ redraw(); scheduleRipple(); }
+  });
+}
+function addRipple(wx, wy, color){ ripples.push({x:wx, y:wy, r:0, color, alpha:0.35}); scheduleRipple(); }
+const loadingOverlay = document.getElementById('loadingOverlay');
+const loadingLabel   = document.getElementById('loadingLabel');
+
+function setLoading(on, msg = 'Generating preview…') {
+  if (loadingOverlay) {
+    loadingOverlay.style.display = on ? 'flex' : 'none';
+  }
+  if (loadingLabel && msg) {
+    loadingLabel.textContent = msg;
+  }
+}
+
+/* ----------------------------- Init & Fit ------------------------------ */
+function loadFrame0(){
+  if (!nframes){ legend.textContent = "No frames found"; return; }
+  const f = frame0;
+  // createImageBitmap yields an already-decoded bitmap, so each redraw is a
+  // plain texture blit instead of a potential re-decode of an <img> element.
+  fetch("/frame?i=0")
+    .then(r => r.blob())
+    .then(b => createImageBitmap(b))
+    .then(bm => {
+      imgBitmap = bm;
+      imgW = bm.width; imgH = bm.height;
+      fitToStage(); redrawBg(); redraw();
+      legend.textContent = "Annotating " + f.split('/').pop();
+    })
+    .catch(() => { legend.textContent = "Failed to load frame"; });
+}
+
+function fitToStage(){
+  // Size the backing stores from the stage box and devicePixelRatio, not
+  // the image: a 4K frame on an 800 px stage only needs stage-sized
+  // surfaces. scale/pan stay in CSS pixels; redraws fold in the dpr.
+  const box = stage.getBoundingClientRect();
+  const dpr = window.devicePixelRatio || 1;
+  for (const cv of [c, bgc]){
+    cv.width  = (box.width  * dpr) | 0;
+    cv.height = (box.height * dpr) | 0;
+    cv.style.width  = box.width  + 'px';
+    cv.style.height = box.height + 'px';
+  }
+  if (!imgW) return;
+  // Compute a scale that fits the image inside the visible stage, centered
+  const pad = 8;
+  const availW = Math.max(200, box.width  - pad*2);
+  const availH = Math.max(200, box.height - pad*2);
+  const sx = availW / imgW;
+  const sy = availH / imgH;
+  scale = Math.max(0.12, Math.min(sx, sy));
+  panX = (box.width  - imgW * scale) / 2;
+  panY = (box.height - imgH * scale) / 2;
+}
+
+/* ------------------------------- Draw ---------------------------------- */
+function updateCount(){
+  countEl.textContent = np; miniCount.textContent = np;
+}
+// The side list is updated incrementally: a row is appended when a point
+// is added and popped on undo, so repaints never touch the list DOM.
+function appendPointRow(p, i){
+  listEl.insertAdjacentHTML('beforeend', `
+    <div class="row"><div>#${i+1} · ${p.l? 'POS':'NEG'}</div>
+    <div class="badge-mini">x:${p.x}, y:${p.y}</div></div>`);
+}
+function popPointRow(){
+  if (listEl.lastElementChild) listEl.lastElementChild.remove();
+}
+function clearPointRows(){ listEl.textContent = ''; }
+function redrawBg(){
+  // The frame image only needs repainting when the view changes
+  // (load, resize, zoom, pan) -- never on point/ripple interactions.
+  if (!imgBitmap) return;
+  const dpr = window.devicePixelRatio || 1;
+  bctx.setTransform(1,0,0,1,0,0); bctx.clearRect(0,0,bgc.width,bgc.height);
+  bctx.setTransform(scale*dpr,0,0,scale*dpr,panX*dpr,panY*dpr);
+  bctx.imageSmoothingEnabled = true;
+  bctx.drawImage(imgBitmap, 0, 0);
+}
+function redraw(){
+  if (!imgBitmap) return;
+  const dpr = window.devicePixelRatio || 1;
+  ctx.setTransform(1,0,0,1,0,0); ctx.clearRect(0,0,c.width,c.height);
+  ctx.setTransform(scale*dpr,0,0,scale*dpr,panX*dpr,panY*dpr);
+
+  // Batch all rings/dots of one colour into a Path2D so the whole set is
+  // four draw calls instead of two per point.
+  const ringR = 7/scale, dotR = 2.6/scale;
+  const posRing = new Path2D(), posDot = new Path2D();
+  const negRing = new Path2D(), negDot = new Path2D();
+  for (let i = 0; i < np; i++){
+    const x = px[i], y = py[i];
+    const ring = pl[i] ? posRing : negRing, dot = pl[i] ? posDot : negDot;
+    ring.moveTo(x + ringR, y); ring.arc(x, y, ringR, 0, 2*Math.PI);
+    dot.moveTo(x + dotR, y);   dot.arc(x, y, dotR, 0, 2*Math.PI);
+  }
+  const lw = 2/scale, invScale = 1/scale;
+  ctx.lineWidth = lw;
+  ctx.strokeStyle = POS_COLOR; ctx.stroke(posRing);
+  ctx.fillStyle   = POS_COLOR; ctx.fill(posDot);
+  ctx.strokeStyle = NEG_COLOR; ctx.stroke(negRing);
+  ctx.fillStyle   = NEG_COLOR; ctx.fill(negDot);
+  for (const r of ripples){
+    ctx.beginPath(); ctx.arc(r.x, r.y, r.r * invScale, 0, 2*Math.PI);
+    ctx.strokeStyle = r.color.replace('1)', r.alpha + ')'); ctx.stroke();
+    r.r += 12; r.alpha *= 0.92;
+  }
+  for (let i = ripples.length-1; i>=0; i--){ if (ripples[i].alpha < 0.04) ripples.splice(i,1); }
+
+}
+
+/* ------------------------- Coordinate helpers -------------------------- */
+// Bounding rects only change on resize, so cache them instead of forcing
+// layout with getBoundingClientRect() on every pointer event.
+let cRect = null, stageRect = null;
+function refreshRects(){ cRect = c.getBoundingClientRect(); stageRect = stage.getBoundingClientRect(); }
+function getCanvasScreenXY(e){ if (!cRect) refreshRects(); return { sx: e.clientX - cRect.left, sy: e.clientY - cRect.top }; }
+function screenToWorldCanvas(sx, sy){ return { x: Math.round((sx - panX)/scale), y: Math.round((sy - panY)/scale) }; }
+
+/* ------------------------------- Events -------------------------------- */
+// Resize bursts coalesce to at most one refit/repaint per animation frame.
+let resizePending = false;
+new ResizeObserver(()=>{
+  if (resizePending) return;
+  resizePending = true;
+  requestAnimationFrame(()=>{ resizePending = false; fitToStage(); refreshRects(); redrawBg(); redraw(); });
+}).observe(stage);
+
+// Crosshair + live coords (measured on canvas), coalesced to one DOM
+// update per animation frame -- trackpads can emit moves at 240 Hz.
+let lastMove = null, movePending = false;
+c.addEventListener('mousemove', (e)=>{
+  lastMove = e;
+  if (movePending) return;
+  movePending = true;
+  requestAnimationFrame(()=>{
+    movePending = false;
+    const { sx, sy } = getCanvasScreenXY(lastMove);
+    const w = screenToWorldCanvas(sx, sy);
+    crosshair.style.setProperty('--x', `${(cRect.left - stageRect.left) + sx}px`);
+    crosshair.style.setProperty('--y', `${(cRect.top  - stageRect.top ) + sy}px`);
+    coords.textContent = `x: ${Math.max(0,Math.min(imgW, w.x))}, y: ${Math.max(0,Math.min(imgH, w.y))} | zoom: ${scale.toFixed(2)}×`;
+  });
+}, {passive:true});
+
+// Wheel zoom anchored at cursor. This is the only listener that may
+// preventDefault, so it alone stays non-passive; everything else is
+// passive and never blocks the compositor's input path.
+c.addEventListener('wheel', (e)=>{
+  if (!imgBitmap) return;
+  e.preventDefault();
+  const { sx, sy } = getCanvasScreenXY(e);
+  const before = screenToWorldCanvas(sx, sy);
+  const newScale = Math.min(12, Math.max(0.1, scale * (1 - Math.sign(e.deltaY)*0.12)));
+  scale = newScale;
+  panX = sx - (before.x * scale);
+  panY = sy - (before.y * scale);
+  redrawBg(); redraw();
+},{passive:false});
+
+// Space = pan mode
+window.addEventListener('keydown', (e)=>{ if (e.code === 'Space') spaceDown = true; });
+window.addEventListener('keyup',   (e)=>{ if (e.code === 'Space') spaceDown = false; });
+
+// Mouse down (pan or add point)
+c.addEventListener('mousedown', (e)=>{
+  const { sx, sy } = getCanvasScreenXY(e);
+  if (spaceDown){
+    isPanning = true; panStartX = sx; panStartY = sy; worldStartX = panX; worldStartY = panY; stage.style.cursor = 'grabbing'; return;
+  }
+  const w = screenToWorldCanvas(sx, sy);
+  const label = (e.button === 2) ? 0 : mode;  // right-click forces NEG
+  if (np === px.length) growPoints();
+  px[np] = w.x; py[np] = w.y; pl[np] = label; np++;
+  appendPointRow({x: w.x, y: w.y, l: label}, np - 1);
+  updateCount();
+  addRipple(w.x, w.y, label ? POS_RGBA : NEG_RGBA);
+  redraw();
+}, {passive:true});
+c.addEventListener('contextmenu', e => e.preventDefault());
+
+// Pan drag
+c.addEventListener('mousemove', (e)=>{
+  if (!isPanning) return;
+  const { sx, sy } = getCanvasScreenXY(e);
+  panX = worldStartX + (sx - panStartX);
+  panY = worldStartY + (sy - panStartY);
+  redrawBg(); redraw();
+}, {passive:true});
+window.addEventListener('mouseup', ()=>{ isPanning = false; stage.style.cursor = 'crosshair'; }, {passive:true});
+
+// Undo
+function undo(){ if (!np) return; np--; popPointRow(); updateCount(); redraw(); }
+window.addEventListener('keydown', (e)=>{
+  const tgt = (e.target.tagName||'').toLowerCase();
+  if (tgt === 'input' || tgt === 'textarea' || e.isComposing) return;
+  const isUndo = (e.key === 'u' || e.key === 'U') || ((e.ctrlKey||e.metaKey) && e.key.toLowerCase()==='z');
+  if (isUndo){ e.preventDefault(); undo(); }
+});
+
+// Mode toggle
+const posBtn = document.getElementById('posBtn');
+const negBtn = document.getElementById('negBtn');
+posBtn.addEventListener('click', ()=>{ mode=1; posBtn.classList.add('active','pos'); negBtn.classList.remove('active'); });
+negBtn.addEventListener('click', ()=>{ mode=0; negBtn.classList.add('active','neg'); posBtn.classList.remove('active'); });
+
+// Grid & clear
+function toggleGrid(){ grid.classList.toggle('show'); }
+function clearAll(){ if (confirm('Clear all points?')){ np = 0; clearPointRows(); updateCount(); redraw(); } }
+
+// Save
+function showToast(msg="Saved"){ toast.textContent = msg; toast.classList.add('show'); setTimeout(()=>toast.classList.remove('show'), 1300); }
+const previewModal = document.getElementById('previewModal');
+const previewGrid  = document.getElementById('previewGrid');
+const doneOverlay  = document.getElementById('doneOverlay');
+
+
+// Pack the SoA points into the wire format the server expects:
+// little-endian int32 x, int32 y, uint8 label per point (9 bytes).
+function packPointsBinary(){
+  const buf = new ArrayBuffer(9 * np);
+  const dv = new DataView(buf);
+  for (let i = 0; i < np; i++){
+    dv.setInt32(9*i,     px[i], true);
+    dv.setInt32(9*i + 4, py[i], true);
+    dv.setUint8(9*i + 8, pl[i]);
+  }
+  return buf;
+}
+
+function renderPreviewModal(previews){
+  const main = previews[0];
+  const thumbs = previews.slice(1);  // random 5
+
+  let html = `
+    <div style="border-radius:14px; overflow:hidden;
+                border:1px solid rgba(255,255,255,0.18);
+                background:#000;">
+      <img src="${main}"
+          style="display:block; width:100%; max-height:420px;
+                  object-fit:contain;">
+    </div>
+  `;
+  if (thumbs.length){
+    html += `
+      <div style="display:flex; flex-wrap:wrap; gap:10px;">
+        ${thumbs.map(url => `
+          <div style="flex:1 1 160px; max-width:220px;
+                      border-radius:12px; overflow:hidden;
+                      border:1px solid rgba(255,255,255,0.12);
+                      background:#000;">
+            <img src="${url}" style="display:block; width:100%; height:auto;">
+          </div>
+        `).join('')}
+      </div>
+    `;
+  }
+  previewGrid.innerHTML = html;
+}
+
+// Incremental thumbnail while the preview run is still going: shows the
+// first mask as soon as the backend writes it.
+function appendStreamThumb(url){
+  previewGrid.insertAdjacentHTML('beforeend', `
+    <div style="display:inline-block; width:160px; margin:5px;
+                border-radius:12px; overflow:hidden;
+                border:1px solid rgba(255,255,255,0.12); background:#000;">
+      <img src="${url}" style="display:block; width:100%; height:auto;">
+    </div>
+  `);
+}
+
+async function save(){
+  showToast('Generating preview…');
+  setLoading(true, 'Generating preview…');
+
+  try{
+    const r = await fetch('/save', {
+      method:'POST',
+      headers:{'Content-Type':'application/octet-stream'},
+      body: packPointsBinary()
+    });
+
+    if (!r.ok){
+      setLoading(false);
+      showToast('Save failed');
+      alert('Save failed: ' + await r.text());
+      return;
+    }
+
+    const data = await r.json();
+    if (!data.ok){
+      setLoading(false);
+      showToast('Save failed');
+      alert('Save failed: ' + (data.error || 'Unknown error'));
+      return;
+    }
+
+    // /save returns immediately; previews arrive over SSE as the backend
+    // writes them, so the first thumbnail shows at time-to-first-mask.
+    previewGrid.innerHTML = '';
+    const es = new EventSource(data.stream || '/save_stream');
+    es.addEventListener('status', ()=>{ setLoading(true, 'Running SAM2 preview…'); });
+    es.addEventListener('frame', (e)=>{
+      previewModal.style.display = 'flex';
+      appendStreamThumb(e.data);
+    });
+    es.addEventListener('done', (e)=>{
+      es.close();
+      const previews = JSON.parse(e.data);
+      setLoading(false);
+      if (!previews.length){
+        previewModal.style.display = 'none';
+        showToast('No preview generated');
+        alert('No preview images generated. Check the backend preview logic.');
+        return;
+      }
+      renderPreviewModal(previews);
+      previewModal.style.display = 'flex';
+      showToast('Preview ready');
+    });
+    es.onerror = ()=>{
+      es.close();
+      setLoading(false);
+      showToast('Save failed');
+    };
+  }catch(err){
+    setLoading(false);
+    showToast('Save failed');
+    alert('Save failed: ' + err);
+  }
+}
+document.getElementById('confirmBtn').addEventListener('click', async () => {
+  try{
+    const r = await fetch('/confirm', { method:'POST' });
+    const data = await r.json();
+    if (!r.ok || !data.ok){
+      alert('Failed to confirm: ' + (data.error || 'unknown'));
+      return;
+    }
+   
+    previewModal.style.display = 'none';
+    showToast('Confirmed');
+    doneOverlay.style.display = 'flex';
+  }catch(err){
+    alert('Failed to confirm: ' + err);
+  }
+});
+
+document.getElementById('restartBtn').addEventListener('click', async () => {
+  if (!confirm('Discard these prompts and start over?')) return;
+  try{
+    const r = await fetch('/restart', { method:'POST' });
+    const data = await r.json();
+    if (!r.ok || !data.ok){
+      alert('Failed to restart: ' + (data.error || 'unknown'));
+      return;
+    }
+    showToast('Restarted');
+    previewModal.style.display = 'none';
+    // Clear all points locally too
+    np = 0;
+    clearPointRows(); updateCount();
+    redraw();
+  }catch(err){
+    alert('Failed to restart: ' + err);
+  }
+});
+
+
+
+// Start
+loadFrame0();
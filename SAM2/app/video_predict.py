@@ -1,6 +1,20 @@
 #!/usr/bin/env python3
-import os, glob, json, cv2, torch, numpy as np
+import os, json, cv2, torch, numpy as np
 import argparse
+from subprocess import Popen, PIPE
+
+try:
+    import orjson  # optional; C-speed JSON parse straight from bytes
+except ImportError:
+    orjson = None
+
+try:
+    # optional; libjpeg-turbo's SIMD paths, ~2-3x cv2's JPEG codec
+    from turbojpeg import TJPF_BGR, TurboJPEG
+
+    _tj = TurboJPEG()
+except Exception:
+    _tj = None
 
 from sam2.sam2_video_predictor import SAM2VideoPredictor
 
@@ -17,7 +31,14 @@ QUIET = os.environ.get("QUIET", "1")  # 0 to see logs
 
 ACCEPT_EXTS = (".jpg", ".jpeg", ".png")
 
-if QUIET == "1":
+
+def _silence_logs():
+    """
+    Redirect stdout/stderr to /dev/null and mute library warnings. Only
+    called from the __main__ entry point: importing this module (the
+    picker app does, for in-process previews) must not hijack the
+    importing process's streams.
+    """
     import sys, warnings
     os.environ["OPENCV_LOG_LEVEL"] = "SILENT"
     os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
@@ -28,14 +49,36 @@ if QUIET == "1":
     except Exception:
         pass
 
+# Optional: also/instead encode the full-propagation cutouts into one video
+# through a single long-lived ffmpeg process (raw BGR frames over stdin)
+# rather than one compressed image file per frame. Off by default because
+# the SuGaR pipeline consumes the per-frame files in *_masked/.
+VIDEO_OUT = os.environ.get("SAM2_VIDEO_OUT", "0") == "1"
+VIDEO_FPS = os.environ.get("SAM2_VIDEO_FPS", "30")
+
+# Optional: composite cutouts on the GPU (nvJPEG decode + torch masking,
+# one uint8 device-to-host copy of the finished frame) instead of the CPU
+# OpenCV path. JPEG sources only; falls back to the CPU path on failure.
+GPU_COMPOSITE = os.environ.get("SAM2_GPU_COMPOSITE", "0") == "1"
+
 
 # ===================== HELPERS =====================
 def _gather_frames(d):
-    files = []
-    for ext in ACCEPT_EXTS:
-        files += glob.glob(os.path.join(d, f"*{ext}"))
-        files += glob.glob(os.path.join(d, f"*{ext.upper()}"))
-    return sorted(set(os.path.abspath(p) for p in files))
+    # One scandir pass instead of six globs (two case variants per
+    # extension), each of which re-read the directory; is_file() reuses the
+    # dirent type from scandir instead of a per-entry stat.
+    try:
+        with os.scandir(d) as it:
+            files = [
+                os.path.abspath(e.path)
+                for e in it
+                if e.name.lower().endswith(ACCEPT_EXTS)
+                # follow symlinks: ensure_indexed may fall back to them
+                and e.is_file()
+            ]
+    except FileNotFoundError:
+        return []
+    return sorted(files)
 
 
 def _is_indexed_name(p):
@@ -56,51 +99,207 @@ def ensure_indexed(src_dir, suffix="_indexed"):
     dst    = os.path.join(parent, base + suffix)
     os.makedirs(dst, exist_ok=True)
 
-    # Rebuild the indexed set every time (simple & safe)
-    for f in os.listdir(dst):
-        os.remove(os.path.join(dst, f))
-
+    # Expected indexed name -> source path
+    expected = {}
     for i, f in enumerate(files):
         ext = os.path.splitext(f)[1].lower()
         if ext not in ACCEPT_EXTS:
             continue
-        newp = os.path.join(dst, f"{i:06d}{ext}")
-        shutil.copy2(f, newp)
+        expected[f"{i:06d}{ext}"] = f
+
+    # Drop only entries that no longer belong instead of wiping the dir
+    for name in os.listdir(dst):
+        if name not in expected:
+            os.remove(os.path.join(dst, name))
+
+    # Hardlink instead of copying frame bytes: same-filesystem inode ops
+    # instead of O(frame size) I/O per frame. Fall back to symlink, then a
+    # real copy, for filesystems that refuse links.
+    for name, f in expected.items():
+        newp = os.path.join(dst, name)
+        if os.path.lexists(newp):
+            try:
+                if os.path.samefile(f, newp):
+                    continue  # hardlink from a previous run, still current
+            except OSError:
+                pass
+            os.remove(newp)
+        try:
+            os.link(f, newp)
+        except OSError:
+            try:
+                os.symlink(os.path.abspath(f), newp)
+            except OSError:
+                shutil.copy2(f, newp)
 
     return dst
 
 
 
-def to_u8_mask(x):
-    if isinstance(x, torch.Tensor):
-        x = x.detach().cpu().squeeze()
-        if x.is_floating_point():
-            x = x > 0.5
-        x = x.to(torch.uint8).numpy()
+# Encoder settings for the per-frame writes: libpng at its default level
+# dominates the propagation loop, so use the fastest compression for masks
+# and a fixed quality for JPEG cutouts.
+_PNG_FAST = [cv2.IMWRITE_PNG_COMPRESSION, 1]
+_JPEG_Q = [cv2.IMWRITE_JPEG_QUALITY, 95]
+
+
+def _write_buf(path, buf):
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, buf)
+    finally:
+        os.close(fd)
+    return True
+
+
+def _imwrite_fast(path, img):
+    # Encode in memory (libjpeg-turbo for JPEGs when available), then
+    # write the whole buffer through a raw fd: one open/write/close per
+    # file, no stdio FILE* buffering in between.
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".jpg", ".jpeg") and _tj is not None:
+        try:
+            return _write_buf(path, _tj.encode(img, quality=95, pixel_format=TJPF_BGR))
+        except Exception:
+            pass
+    if ext == ".png":
+        params = _PNG_FAST
+    elif ext in (".jpg", ".jpeg"):
+        params = _JPEG_Q
     else:
-        x = np.asarray(x).squeeze()
-        if x.dtype.kind == "f":
-            x = x > 0.5
-        x = x.astype(np.uint8)
-    return x * 255
+        params = []
+    ok, buf = cv2.imencode(ext if ext else ".jpg", img, params)
+    if not ok:
+        return cv2.imwrite(path, img)
+    return _write_buf(path, buf)
+
+
+def _read_bgr(path):
+    """Decode a frame to BGR, via turbojpeg for JPEGs when available."""
+    if _tj is not None and path.lower().endswith((".jpg", ".jpeg")):
+        try:
+            with open(path, "rb") as f:
+                return _tj.decode(f.read(), pixel_format=TJPF_BGR)
+        except Exception:
+            pass
+    return cv2.imread(path, cv2.IMREAD_COLOR)
+
+
+class _FfmpegSink:
+    """
+    One ffmpeg process encoding raw BGR frames written to its stdin.
+    Spawned lazily on the first frame (that is when dims are known);
+    close() finishes the stream and waits for the encoder.
+    """
+
+    def __init__(self, out_path, fps):
+        self.out_path = out_path
+        self.fps = fps
+        self.proc = None
+
+    def write(self, frame):
+        if self.proc is None:
+            h, w = frame.shape[:2]
+            self.proc = Popen(
+                [
+                    "ffmpeg", "-y", "-loglevel", "error",
+                    "-f", "rawvideo", "-pix_fmt", "bgr24",
+                    "-s", f"{w}x{h}", "-r", str(self.fps), "-i", "pipe:",
+                    "-c:v", "libx264", "-pix_fmt", "yuv420p",
+                    self.out_path,
+                ],
+                stdin=PIPE,
+                bufsize=0,
+            )
+        self.proc.stdin.write(np.ascontiguousarray(frame).tobytes())
+
+    def close(self):
+        if self.proc is not None:
+            self.proc.stdin.close()
+            self.proc.wait()
 
 
-def save_color_cutout(orig_img_path, mask_u8, out_path):
-    img = cv2.imread(orig_img_path, cv2.IMREAD_COLOR)
-    if img is None:
-        raise FileNotFoundError(orig_img_path)
+def to_u8_mask(x):
+    if isinstance(x, torch.Tensor):
+        # Threshold and scale on-device so the device-to-host copy moves
+        # uint8 pixels, a quarter the bytes of the fp32 logits (half of
+        # bf16), instead of doing three more passes after the transfer.
+        x = x.detach()
+        if x.is_floating_point():
+            x = (x > 0.5).to(torch.uint8).mul_(255)
+        else:
+            # Out-of-place: .to() is a no-op on uint8 input, so an
+            # in-place mul_ would scribble over the caller's mask.
+            x = x.to(torch.uint8).mul(255)
+        return x.squeeze().cpu().numpy()
+    x = np.asarray(x).squeeze()
+    if x.dtype.kind == "f":
+        x = x > 0.5
+    return x.astype(np.uint8) * 255
+
+
+# Reusable per-shape scratch buffers for the save path. All saves happen
+# on a single thread at a time (main thread, or the writer thread during
+# propagation), so the buffers can be shared across frames: on long runs
+# this keeps RSS flat instead of churning ~25 MB of short-lived arrays
+# per 1080p frame.
+_SCRATCH = {}
+
+
+def _scratch(name, shape, dtype=np.uint8):
+    key = (name, shape)
+    buf = _SCRATCH.get(key)
+    if buf is None:
+        buf = _SCRATCH[key] = np.empty(shape, dtype)
+    return buf
+
+
+def _binary_mask_for(img, mask_u8):
+    """Squeeze, resize and binarize a mask to match a decoded frame."""
     m = mask_u8[..., 0] if mask_u8.ndim == 3 else mask_u8
+    dst = _scratch("mask", img.shape[:2])
     if m.shape[:2] != img.shape[:2]:
         m = cv2.resize(
             m, (img.shape[1], img.shape[0]),
-            interpolation=cv2.INTER_NEAREST
+            dst=dst, interpolation=cv2.INTER_NEAREST
         )
-    _, m = cv2.threshold(m, 127, 255, cv2.THRESH_BINARY)
-    cutout = cv2.bitwise_and(img, img, mask=m)
-    cv2.imwrite(out_path, cutout)
+    _, m = cv2.threshold(m, 127, 255, cv2.THRESH_BINARY, dst=dst)
+    return m
+
+
+def _gpu_cutout(mask_t, frame_path):
+    """
+    Build one BGR cutout entirely on the GPU: decode the source JPEG with
+    nvJPEG, upscale the mask with nearest interpolation, zero the
+    background with torch.where, and ship a single uint8 frame back.
+    """
+    import torch.nn.functional as F
+    from torchvision.io import decode_jpeg, read_file
+
+    img = decode_jpeg(read_file(frame_path), device="cuda")  # RGB, CHW u8
+    m = mask_t.detach()
+    if m.is_floating_point():
+        m = m > 0.5
+    m = m.squeeze()[None, None].float()
+    m = F.interpolate(m, size=img.shape[-2:], mode="nearest")[0, 0] > 0
+    out = torch.where(m, img, torch.zeros_like(img))
+    return out.flip(0).permute(1, 2, 0).contiguous().cpu().numpy()
+
+
+def save_color_cutout(img, mask_u8, out_path, sink=None):
+    m = _binary_mask_for(img, mask_u8)
+    # Masked copy into a zeroed buffer: one read + one write instead of
+    # bitwise_and's self-AND over the whole frame.
+    cutout = _scratch("cutout", img.shape)
+    cutout.fill(0)
+    cv2.copyTo(img, m, dst=cutout)
+    if sink is not None:
+        sink.write(cutout)
+    else:
+        _imwrite_fast(out_path, cutout)
 
 def save_overlay_preview(
-    orig_img_path,
+    img,
     mask_u8,
     out_path,
     dim_alpha: float = 0.6,
@@ -115,55 +314,52 @@ def save_overlay_preview(
 
     dim_alpha ~ 0.5–0.7 works well (0.6 = 60% darker background).
     """
-    img = cv2.imread(orig_img_path, cv2.IMREAD_COLOR)
-    if img is None:
-        raise FileNotFoundError(orig_img_path)
-
-    # Ensure mask matches image resolution
-    m = mask_u8[..., 0] if mask_u8.ndim == 3 else mask_u8
-    if m.shape[:2] != img.shape[:2]:
-        m = cv2.resize(
-            m, (img.shape[1], img.shape[0]),
-            interpolation=cv2.INTER_NEAREST,
-        )
-
-    # Binary 0/255 mask
-    _, m = cv2.threshold(m, 127, 255, cv2.THRESH_BINARY)
-
-    # Boolean mask (0/1)
-    mask = (m > 0).astype(np.uint8)
+    m = _binary_mask_for(img, mask_u8)
+
+    # Darken everything, then copy the original pixels back over the masked
+    # region. Both calls are SIMD loops inside OpenCV taking the
+    # single-channel mask directly -- no float temporaries, no 3-channel
+    # mask expansion, no python-level np.where passes.
+    out = _scratch("overlay", img.shape)
+    cv2.convertScaleAbs(img, dst=out, alpha=1.0 - float(dim_alpha))
+    cv2.copyTo(img, m, dst=out)
+
+    # Optional border: the morphological gradient is the dilate-minus-
+    # erode ring in one SIMD pass with no temporaries.
+    if border_color is not None:
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+        border = cv2.morphologyEx(m, cv2.MORPH_GRADIENT, kernel)
+        out[border > 0] = np.asarray(border_color, dtype=np.uint8)
 
-    # 3-channel version of the mask
-    mask3 = cv2.merge([mask, mask, mask])  # (H, W, 3)
+    _imwrite_fast(out_path, out)
 
-    # Darkened background
-    img_f = img.astype(np.float32)
-    dim_factor = 1.0 - float(dim_alpha)     # e.g. 0.4 if dim_alpha=0.6
-    dimmed = np.clip(img_f * dim_factor, 0, 255).astype(np.uint8)
 
-    # Keep original where mask==1, dimmed where mask==0
-    out = np.where(mask3 == 1, img, dimmed)
 
-    # Optional border
-    if border_color is not None:
-        kernel = np.ones((3, 3), np.uint8)
-        dilated = cv2.dilate(mask, kernel, iterations=1)
-        border = ((dilated - mask) > 0).astype(np.uint8)
-        border3 = cv2.merge([border, border, border])
-        border_color_arr = np.array(border_color, dtype=np.uint8).reshape(1, 1, 3)
-        out = np.where(border3 == 1, border_color_arr, out)
+# ===================== CORE LOGIC =====================
 
-    cv2.imwrite(out_path, out)
+# Module-level predictor singleton so callers that import this module
+# (e.g. the picker app generating previews in-process) pay the model load
+# and CUDA context init once, not per run.
+_PRED = None
 
 
+def get_predictor():
+    global _PRED
+    if _PRED is None:
+        _PRED = SAM2VideoPredictor.from_pretrained("facebook/sam2-hiera-large").to("cuda")
+    return _PRED
 
-# ===================== CORE LOGIC =====================
 
 def run_sam2(preview=False, preview_num_frames=6, preview_out=None):
     global INPUT
 
-    # 1) Index frames if needed
-    if os.path.isdir(INPUT) and AUTO_INDEX == "1":
+    # 1) Index frames if needed (skip when a previous in-process call
+    # already swapped INPUT for the indexed dir)
+    if (
+        os.path.isdir(INPUT)
+        and AUTO_INDEX == "1"
+        and not INPUT.rstrip("/").endswith(INDEX_SUFFIX)
+    ):
         INPUT = ensure_indexed(INPUT, INDEX_SUFFIX)
 
     # 2) Paths
@@ -188,8 +384,11 @@ def run_sam2(preview=False, preview_num_frames=6, preview_out=None):
             f"Run the web point picker first and press 'Save'."
         )
 
-    with open(PROMPTS_JSON, "r") as f:
-        J = json.load(f)
+    # Read bytes and parse directly; orjson skips the UTF-8 decode to str
+    # that json.load's text-mode path forces.
+    with open(PROMPTS_JSON, "rb") as f:
+        raw = f.read()
+    J = orjson.loads(raw) if orjson is not None else json.loads(raw)
 
     points    = np.array(J["points"], dtype=np.float32)
     labels    = np.array(J["labels"], dtype=np.int32)
@@ -202,84 +401,259 @@ def run_sam2(preview=False, preview_num_frames=6, preview_out=None):
         raise FileNotFoundError(
             f"No frames found in {INPUT} (accepted: {', '.join(ACCEPT_EXTS)})"
         )
-    idx_to_orig_name = [os.path.basename(os.path.realpath(p)) for p in frame_paths]
+    # Paths from _gather_frames are already absolute and indexed names are
+    # deterministic; realpath() here was an lstat per path component per
+    # frame for a value only used as a basename.
+    idx_to_orig_name = [os.path.basename(p) for p in frame_paths]
     num_total_frames = len(frame_paths)
 
-    # 5) SAM2 predictor
-    pred = SAM2VideoPredictor.from_pretrained("facebook/sam2-hiera-large").to("cuda")
+    # 5) SAM2 predictor (cached across calls in the same process)
+    pred = get_predictor()
     use_bf16 = torch.cuda.is_available() and torch.cuda.get_device_capability()[0] >= 8
     dtype = torch.bfloat16 if use_bf16 else torch.float16
 
+    # Let the fp32 matmuls/convs that stay outside autocast use TF32
+    # tensor cores.
+    torch.backends.cuda.matmul.allow_tf32 = True
+    torch.backends.cudnn.allow_tf32 = True
+
+    # Compile the image encoder (the per-frame conv-heavy hot path) so
+    # Inductor can fuse its kernels. Worth it when propagating a whole
+    # dataset; skipped in preview mode where the warmup would dominate a
+    # 6-frame run. SAM2_COMPILE=0 opts out on torch builds where compile
+    # misbehaves.
+    if (
+        not preview
+        and os.environ.get("SAM2_COMPILE", "1") == "1"
+        and not getattr(pred, "_image_encoder_compiled", False)
+    ):
+        try:
+            pred.image_encoder = torch.compile(
+                pred.image_encoder, mode="reduce-overhead", fullgraph=False
+            )
+            pred._image_encoder_compiled = True
+        except Exception:
+            pass
+
     # Are we in preview mode?
     is_preview_mode = bool(preview and preview_out is not None)
 
-    def save_set(frame_idx, obj_ids, masks):
+    # Frame decoding: a small thread pool prefetches upcoming frames
+    # (libjpeg releases the GIL inside OpenCV, so decodes overlap with the
+    # GPU loop and the writer), and a small LRU keeps frames that are
+    # saved twice (preview mode's annotated frame) decoded.
+    from concurrent.futures import ThreadPoolExecutor
+    from functools import lru_cache
+
+    decode_pool = ThreadPoolExecutor(max_workers=4)
+    decode_futures = {}
+
+    def _prefetch_frame(i):
+        if 0 <= i < num_total_frames and i not in decode_futures:
+            decode_futures[i] = decode_pool.submit(_read_bgr, frame_paths[i])
+
+    @lru_cache(maxsize=4)
+    def _get_frame(i):
+        fut = decode_futures.pop(i, None)
+        img = fut.result() if fut is not None else _read_bgr(frame_paths[i])
+        if img is None:
+            raise FileNotFoundError(frame_paths[i])
+        return img
+
+    # Full-run video sink (opt-in, see VIDEO_OUT above). The video replaces
+    # the per-frame visualization files, not the binary masks.
+    video_sink = None
+    if VIDEO_OUT and not is_preview_mode:
+        video_sink = _FfmpegSink(
+            os.path.join(OUT_ROOT, f"{out_name}_masked.mp4"), VIDEO_FPS
+        )
+
+    def save_set(frame_idx, obj_ids, masks, cutouts=None):
         """
-        Save masks + visualization for a given frame.
+        Save masks + visualization for a given frame. `cutouts` carries
+        GPU-composited BGR frames (aligned with obj_ids) when enabled.
         """
         base_name = idx_to_orig_name[frame_idx]
         stem, orig_ext = os.path.splitext(base_name)
         single_obj = len(obj_ids) == 1
-        orig_img_path = os.path.realpath(frame_paths[frame_idx])
+        orig_img_path = frame_paths[frame_idx]
         ext_for_save = orig_ext if orig_ext else ".jpg"
 
+        # Decode the source frame once per call; every object (and both the
+        # cutout and overlay paths) reuses the same ndarray instead of
+        # re-running libjpeg per write. Skipped entirely when the cutouts
+        # were already composited on the GPU.
+        img = _get_frame(frame_idx) if cutouts is None else None
+
         for k, oid in enumerate(obj_ids):
             suffix   = "" if single_obj else f"_obj{oid}"
             out_name = f"{stem}{suffix}{ext_for_save}"
 
             # 1) binary mask -> OUT_DIR
-            mask_u8   = to_u8_mask(masks[k])
+            # (the writer thread hands over masks already converted)
+            mask_u8   = masks[k] if isinstance(masks[k], np.ndarray) else to_u8_mask(masks[k])
             mask_path = os.path.join(OUT_DIR, out_name)
-            cv2.imwrite(mask_path, mask_u8)
+            _imwrite_fast(mask_path, mask_u8)
 
             # 2) visualization -> OUT_MASKED_DIR
             vis_path = os.path.join(OUT_MASKED_DIR, out_name)
             if is_preview_mode:
                 # RGB object, dimmed background, no colored border
                 save_overlay_preview(
-                    orig_img_path,
+                    img,
                     mask_u8,
                     vis_path,
                     dim_alpha=0.9,    # tweak if you want more/less dimming
                     border_color=None # <— this removes the green outline
                 )
+            elif cutouts is not None:
+                if video_sink is not None:
+                    video_sink.write(cutouts[k])
+                else:
+                    _imwrite_fast(vis_path, cutouts[k])
             else:
-                save_color_cutout(orig_img_path, mask_u8, vis_path)
-
-
-
-    # ===================== SAM2 inference =====================
-    with torch.inference_mode(), torch.autocast("cuda", dtype=dtype):
-        state = pred.init_state(INPUT)
+                save_color_cutout(img, mask_u8, vis_path, sink=video_sink)
 
-        # First, the annotated frame (always included in preview)
-        frame_idx, obj_ids, masks = pred.add_new_points_or_box(
-            state, FRAME_IDX, OBJ_ID, points=points, labels=labels
-        )
-        save_set(frame_idx, obj_ids, masks)
-
-        if preview:
-            import random
 
-            # We want: 1 annotated + N random extra frames
-            extra_needed = max(0, min(preview_num_frames - 1, num_total_frames - 1))
 
-            # candidate indices except the annotated frame
-            candidates = [i for i in range(num_total_frames) if i != FRAME_IDX]
-            chosen_extra = set(random.sample(candidates, extra_needed)) if extra_needed > 0 else set()
+    # init_state runs the image encoder over every frame -- usually the
+    # single most expensive step -- and the preview -> confirm -> final
+    # flow repeats it on identical frames. With SAM2_STATE_CACHE=1 the
+    # freshly initialized state (saved before any prompts are added) is
+    # persisted keyed on the frame set and reloaded by later runs.
+    state_cache = None
+    if os.environ.get("SAM2_STATE_CACHE", "0") == "1":
+        import hashlib
+        import tempfile
 
-            saved = 1  # already saved annotated frame
+        newest = max((os.stat(p).st_mtime_ns for p in frame_paths), default=0)
+        key = hashlib.sha1(
+            f"{INPUT}:{newest}:{num_total_frames}".encode()
+        ).hexdigest()
+        state_cache = os.path.join(tempfile.gettempdir(), f"sam2_state_{key}.pt")
 
-            for frame_idx, obj_ids, masks in pred.propagate_in_video(state):
-                if frame_idx in chosen_extra:
-                    save_set(frame_idx, obj_ids, masks)
-                    saved += 1
-                    if saved >= max(1, preview_num_frames):
-                        break
-        else:
-            # full propagation for the pipeline
-            for frame_idx, obj_ids, masks in pred.propagate_in_video(state):
-                save_set(frame_idx, obj_ids, masks)
+    # ===================== SAM2 inference =====================
+    try:
+        with torch.inference_mode(), torch.autocast("cuda", dtype=dtype):
+            state = None
+            if state_cache and os.path.isfile(state_cache):
+                try:
+                    state = torch.load(
+                        state_cache, map_location="cuda", weights_only=False
+                    )
+                except Exception:
+                    state = None
+            if state is None:
+                state = pred.init_state(INPUT)
+                if state_cache:
+                    try:
+                        torch.save(state, state_cache + ".tmp")
+                        os.replace(state_cache + ".tmp", state_cache)
+                    except Exception:
+                        pass
+
+            # First, the annotated frame (always included in preview)
+            frame_idx, obj_ids, masks = pred.add_new_points_or_box(
+                state, FRAME_IDX, OBJ_ID, points=points, labels=labels
+            )
+            save_set(frame_idx, obj_ids, masks)
+
+            if preview:
+                import random
+
+                # We want: 1 annotated + N random extra frames
+                extra_needed = max(0, min(preview_num_frames - 1, num_total_frames - 1))
+
+                # Sample indices directly instead of materializing an
+                # N-element candidate list just to pick a handful.
+                chosen_extra = set()
+                while len(chosen_extra) < extra_needed:
+                    i = random.randrange(num_total_frames)
+                    if i != FRAME_IDX:
+                        chosen_extra.add(i)
+
+                # The preview set is known up front; start decoding it now.
+                for i in chosen_extra:
+                    _prefetch_frame(i)
+
+                saved = 1  # already saved annotated frame
+
+                propagation = pred.propagate_in_video(state)
+                try:
+                    for frame_idx, obj_ids, masks in propagation:
+                        if frame_idx in chosen_extra:
+                            save_set(frame_idx, obj_ids, masks)
+                            saved += 1
+                            if saved >= max(1, preview_num_frames):
+                                break
+                finally:
+                    # Explicitly close the generator so SAM2 releases its
+                    # propagation state now rather than at GC time.
+                    propagation.close()
+            else:
+                # Full propagation for the pipeline. Encoding and writing a
+                # frame takes tens of ms during which the GPU would sit idle,
+                # so a bounded queue plus one writer thread overlaps the next
+                # CUDA step with the previous frame's disk write.
+                import queue
+                import threading
+
+                q = queue.Queue(maxsize=4)
+                write_errors = []
+
+                def _writer_loop():
+                    while True:
+                        item = q.get()
+                        if item is None:
+                            return
+                        if write_errors:
+                            # Keep draining after a failure so the producer's
+                            # blocking put never wedges on a full queue; the
+                            # first error is re-raised after join below.
+                            continue
+                        try:
+                            save_set(*item)
+                        except Exception as e:
+                            write_errors.append(e)
+
+                writer = threading.Thread(target=_writer_loop, daemon=True)
+                writer.start()
+                gpu_composite = GPU_COMPOSITE
+                try:
+                    for frame_idx, obj_ids, masks in pred.propagate_in_video(state):
+                        if write_errors:
+                            break
+                        cutouts = None
+                        if gpu_composite:
+                            try:
+                                cutouts = [
+                                    _gpu_cutout(m, frame_paths[frame_idx])
+                                    for m in masks
+                                ]
+                            except Exception as e:
+                                print(f"[gpu-composite] disabled: {e}", flush=True)
+                                gpu_composite = False
+                        if cutouts is None:
+                            _prefetch_frame(frame_idx + 1)
+                        # Device-side threshold + host copy here, on the main
+                        # thread; the worker only ever touches numpy data.
+                        q.put(
+                            (frame_idx, obj_ids, [to_u8_mask(m) for m in masks], cutouts)
+                        )
+                finally:
+                    q.put(None)
+                    writer.join()
+                    if video_sink is not None:
+                        video_sink.close()
+                if write_errors:
+                    raise write_errors[0]
+    finally:
+        # Tear down the prefetch pool: under in-process previews the
+        # Flask worker calls run_sam2 repeatedly, and idle decode
+        # threads (and unconsumed prefetched frames) would otherwise
+        # accumulate for the life of the process.
+        decode_pool.shutdown(wait=False)
+        decode_futures.clear()
 
 
 
@@ -287,6 +661,9 @@ def run_sam2(preview=False, preview_num_frames=6, preview_out=None):
 # ===================== ENTRY POINT =====================
 
 if __name__ == "__main__":
+    if QUIET == "1":
+        _silence_logs()
+
     parser = argparse.ArgumentParser()
     parser.add_argument(
         "--preview",